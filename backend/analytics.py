@@ -0,0 +1,166 @@
+# analytics.py
+
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import and_, case, func, select
+
+import models
+
+R = models.DailyRollup
+
+
+# --- Periods (inclusive date ranges, so every filter is an index range on day) ---
+def year_range(today: date):
+    return date(today.year, 1, 1), date(today.year, 12, 31)
+
+
+def month_range(today: date):
+    return today.replace(day=1), today.replace(day=calendar.monthrange(today.year, today.month)[1])
+
+
+def week_range(today: date):
+    # MySQL WEEK(d, 1) buckets are Monday-Sunday weeks, compared within the current year
+    start, end = year_range(today)
+    monday = today - timedelta(days=today.weekday())
+    return max(monday, start), min(monday + timedelta(days=6), end)
+
+
+def months_ago(today: date, months: int) -> date:
+    """Same as DATE_SUB(today, INTERVAL months MONTH): clamps to the month's last day."""
+    index = today.year * 12 + today.month - 1 - months
+    year, month = divmod(index, 12)
+    month += 1
+    return date(year, month, min(today.day, calendar.monthrange(year, month)[1]))
+
+
+def period_ranges(today: date) -> dict:
+    return {
+        "year": year_range(today),
+        "month": month_range(today),
+        "week": week_range(today),
+        "date": (today, today),
+    }
+
+
+PERIODS = ("year", "month", "week", "date")
+TREND_KEYS = {"date": "day_trends", "week": "week_trends", "month": "month_trends", "year": "year_trends"}
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+# --- Queries over daily_rollups ---
+def dashboard_query(user_id: int, today: date):
+    """All-time and per-period totals per (category, type_) in one pass.
+
+    Conditional aggregation yields NULL for a period with no rows, which is
+    how dashboard() tells "no activity" apart from a zero total.
+    """
+    columns = [func.sum(R.total).label("all_time")]
+    for name, (start, end) in period_ranges(today).items():
+        in_period = and_(R.day >= start, R.day <= end)
+        columns.append(func.sum(case((in_period, R.total))).label(name))
+    return select(R.category, R.type_, *columns).where(R.user_id == user_id).group_by(R.category, R.type_)
+
+
+def expense_total_query(user_id: int, start: date, end: date):
+    return select(func.sum(R.total)).where(
+        R.user_id == user_id, R.type_ == "Expense", R.day >= start, R.day <= end)
+
+
+def filtered_query(user_id: int, start: date = None, end: date = None,
+                   type_: str = None, category: str = None):
+    stmt = select(R.category, func.sum(R.total), R.type_, R.day).where(R.user_id == user_id)
+    if start:
+        stmt = stmt.where(R.day >= start)
+    if end:
+        stmt = stmt.where(R.day <= end)
+    if type_:
+        stmt = stmt.where(R.type_ == type_)
+    if category:
+        stmt = stmt.where(R.category == category)
+    return stmt.group_by(R.category, R.type_, R.day).order_by(R.day)
+
+
+def expense_by_category_query(user_id: int, since: date):
+    return (
+        select(R.category, func.sum(R.total))
+        .where(R.user_id == user_id, R.type_ == "Expense", R.day >= since)
+        .group_by(R.category)
+    )
+
+
+def monthly_expense_query(user_id: int, since: date):
+    return select(R.day, R.category, R.total).where(
+        R.user_id == user_id, R.type_ == "Expense", R.day >= since)
+
+
+def monthly_expense_users_query(user_ids: list, since: date):
+    return select(R.user_id, R.day, R.category, R.total).where(
+        R.user_id.in_(user_ids), R.type_ == "Expense", R.day >= since)
+
+
+def dashboard(db, user_id: int, today: date = None) -> dict:
+    """The /analytics/all and /analytics/trends payloads from a single query."""
+    today = today or date.today()
+    rows = db.execute(dashboard_query(user_id, today)).all()
+
+    totals = defaultdict(float)
+    periods = {name: [] for name in PERIODS}
+    trends = {name: defaultdict(float) for name in TREND_KEYS}
+    for row in rows:
+        totals[row.type_.strip().lower()] += float(row.all_time or 0)
+        for name in PERIODS:
+            value = row._mapping[name]
+            if value is None:
+                continue
+            periods[name].append({"category": row.category, "total": float(value), "type_": row.type_})
+            trends[name][row.type_] += float(value)
+
+    if rows:
+        summary = {
+            "total_income": totals["income"],
+            "total_expense": totals["expense"],
+            "net_savings": totals["income"] - totals["expense"],
+        }
+    else:
+        summary = {"total_income": None, "total_expense": None, "net_savings": None}
+    for items in periods.values():
+        items.sort(key=lambda item: item["total"], reverse=True)
+    return {
+        "all": {"summary": summary, **periods},
+        "trends": {
+            key: [{"total": total, "type_": type_} for type_, total in sorted(trends[name].items())]
+            for name, key in TREND_KEYS.items()
+        },
+    }
+
+
+def expense_total(db, user_id: int, start: date, end: date):
+    return _float(db.scalar(expense_total_query(user_id, start, end)))
+
+
+def filtered(db, user_id: int, start: date = None, end: date = None,
+             type_: str = None, category: str = None) -> list:
+    rows = db.execute(filtered_query(user_id, start, end, type_, category)).all()
+    return [{"category": c, "total": _float(t), "type_": ty, "date": d} for c, t, ty, d in rows]
+
+
+def expense_by_category(db, user_id: int, since: date) -> dict:
+    rows = db.execute(expense_by_category_query(user_id, since)).all()
+    return {c: float(t) for c, t in rows}
+
+
+def explain_targets(user_id: int, today: date) -> dict:
+    """Every statement the analytics endpoints issue, for index-usage checks."""
+    return {
+        "dashboard": dashboard_query(user_id, today),
+        "monthly_spending": expense_total_query(user_id, *month_range(today)),
+        "filter": filtered_query(user_id, months_ago(today, 1), today, "Expense", "Food"),
+        "recommend_budget": expense_by_category_query(user_id, months_ago(today, 6)),
+        "predict_budget": monthly_expense_query(user_id, months_ago(today, 12)),
+        "forecast_batch": monthly_expense_users_query([user_id, user_id + 1], months_ago(today, 12)),
+    }
@@ -0,0 +1,134 @@
+# analytics_cache.py
+"""Serialized analytics responses keyed by the user's data version.
+
+Every write path calls bump(user_id) after it commits, so cached payloads
+never need explicit invalidation. A read builds its key (endpoint, user,
+version, today, TTL bucket, params) before querying and stores the JSON
+bytes under it. After the next bump, nothing looks that key up again.
+
+Entries include today's date because the period buckets move at midnight.
+The key, and so the ETag, also includes the current ANALYTICS_CACHE_TTL
+window, so neither a cached payload nor a 304 outlives it.
+
+With the local version store (the default) versions are per process: a
+worker that did not see a bump keeps answering from the old version until
+the TTL window rolls over. Set ANALYTICS_VERSION_BACKEND=redis (and
+ANALYTICS_VERSION_URL) so all workers share one counter per user; a bump
+then takes effect everywhere at once and ETags match across workers.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+from cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "20000"))
+TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+VERSION_BACKEND = os.getenv("ANALYTICS_VERSION_BACKEND", "local")
+VERSION_URL = os.getenv("ANALYTICS_VERSION_URL", "redis://localhost:6379/0")
+
+CACHE = LRUCache(maxsize=MAX_SIZE, ttl=TTL)
+
+
+# --- Version stores ---
+class LocalVersions:
+    def __init__(self):
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def incr(self, user_id: int):
+        with self._lock:
+            self._versions[user_id] += 1
+
+    def stats(self) -> dict:
+        return {"version_backend": "local", "users_tracked": len(self._versions)}
+
+
+class RedisVersions:
+    """Shared across workers. A failed read returns None and the request
+    skips the cache; a failed bump is logged, and the TTL window bounds how
+    long other workers serve the old version."""
+
+    prefix = "finance:analytics_version:"
+    # Counters of idle users expire; a restart from 0 falls in a later TTL window
+    expire = 7 * 86400
+
+    def __init__(self, url: str = VERSION_URL):
+        import redis
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.errors = 0
+
+    def get(self, user_id: int):
+        try:
+            return int(self._redis.get(f"{self.prefix}{user_id}") or 0)
+        except Exception:
+            self.errors += 1
+            return None
+
+    def incr(self, user_id: int):
+        name = f"{self.prefix}{user_id}"
+        try:
+            self._redis.pipeline().incr(name).expire(name, self.expire).execute()
+        except Exception:
+            self.errors += 1
+            logger.warning("Could not bump analytics version for user %s", user_id, exc_info=True)
+
+    def stats(self) -> dict:
+        return {"version_backend": "redis", "version_errors": self.errors}
+
+
+def make_versions(name: str = VERSION_BACKEND):
+    if name == "redis":
+        return RedisVersions()
+    if name != "local":
+        logger.warning("Unknown ANALYTICS_VERSION_BACKEND %r, using local", name)
+    return LocalVersions()
+
+
+versions = make_versions()
+
+
+def version(user_id: int):
+    return versions.get(user_id)
+
+
+def bump(user_id: int):
+    """Call after committing any change to the user's transactions."""
+    versions.incr(user_id)
+
+
+def key(endpoint: str, user_id: int, params: dict = None):
+    """Cache key, or None when the user's version can't be read (don't cache)."""
+    current = versions.get(user_id)
+    if current is None:
+        return None
+    params = tuple(sorted((params or {}).items()))
+    window = int(time.time() // TTL) if TTL > 0 else 0
+    return endpoint, user_id, current, date.today().isoformat(), window, params
+
+
+def etag(cache_key: tuple) -> str:
+    digest = hashlib.blake2b(repr(cache_key).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get(cache_key: tuple):
+    return CACHE.get(cache_key)
+
+
+def put(cache_key: tuple, body: bytes):
+    CACHE.put(cache_key, body)
+
+
+def stats() -> dict:
+    return {**CACHE.stats(), **versions.stats()}
@@ -0,0 +1,111 @@
+# cold_start.py
+"""Worker boot time, and where the import time goes.
+
+Each run starts a fresh interpreter that imports main, runs the lifespan
+startup (schema, seed, job recovery) and serves one request, against a
+scratch SQLite database (or --database-url). Reported per HEAVY_IMPORTS
+mode (see lazy_imports.py):
+
+    ready_ms          process spawn until the app can take requests
+    first_request_ms  one cheap request (no pandas/numpy needed)
+    heavy_request_ms  the first request that needs pandas (a CSV upload)
+    phases            startup.TIMINGS: import_main, init_db, resume_jobs
+
+--importtime adds the -X importtime breakdown of `import main`, summed by
+top-level package.
+
+    python benchmarks/cold_start.py --runs 5 --modes lazy eager --importtime
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CSV = os.path.join(BACKEND_DIR, "labeled_transactions.csv")
+
+# Runs in the child; prints one JSON line
+BOOT = """
+import json, time, warnings
+warnings.filterwarnings("ignore")
+ready_at = None
+from fastapi.testclient import TestClient
+import main, startup
+with TestClient(main.app) as client:
+    ready_at = time.time()
+    t0 = time.perf_counter()
+    client.get("/statement_formats/").raise_for_status()
+    first = time.perf_counter() - t0
+    user = client.post("/signup", json={"name": "boot", "mobile": "9" + str(time.time_ns())[-9:], "password": "x"})
+    t0 = time.perf_counter()
+    with open(%(csv)r, "rb") as f:
+        client.post("/upload_csv/", params={"user_id": user.json()["id"]},
+                    files={"file": ("s.csv", f, "text/csv")}).raise_for_status()
+    heavy = time.perf_counter() - t0
+print(json.dumps({"ready_at": ready_at, "first": first, "heavy": heavy, "phases": startup.TIMINGS}))
+"""
+
+
+def boot_once(env: dict) -> dict:
+    started = time.time()
+    out = subprocess.run([sys.executable, "-c", BOOT % {"csv": SAMPLE_CSV}], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True)
+    if out.returncode:
+        sys.exit(f"boot failed:\n{out.stderr}")
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return {
+        "ready_ms": (result["ready_at"] - started) * 1000,
+        "first_request_ms": result["first"] * 1000,
+        "heavy_request_ms": result["heavy"] * 1000,
+        **{f"{k}_ms": v * 1000 for k, v in result["phases"].items()},
+    }
+
+
+def bench_mode(mode: str, runs: int, env: dict) -> dict:
+    samples = [boot_once({**env, "HEAVY_IMPORTS": mode}) for _ in range(runs)]
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+def import_breakdown(env: dict, top: int) -> list:
+    """(package, cumulative ms) of `import main`, from self times summed by top-level package."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                         env=env, capture_output=True, text=True, check=True)
+    totals = defaultdict(int)
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us)
+    return sorted(((pkg, round(us / 1000, 1)) for pkg, us in totals.items()), key=lambda x: -x[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker boot time per HEAVY_IMPORTS mode")
+    parser.add_argument("--runs", type=int, default=3, help="boots per mode (median reported)")
+    parser.add_argument("--modes", nargs="+", default=["lazy", "eager"], choices=["lazy", "background", "eager"])
+    parser.add_argument("--importtime", action="store_true", help="also print the import breakdown")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--database-url", help="default: a scratch SQLite file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finance-boot-")
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, "IMPORT_SPOOL_DIR": os.path.join(workdir, "spool"),
+           "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(workdir, 'boot.db')}"}
+    env.pop("ASYNC_DATABASE_URL", None)
+
+    results = {mode: bench_mode(mode, args.runs, env) for mode in args.modes}
+    print(json.dumps(results, indent=2))
+    if args.importtime:
+        print(f"\n{'package':30} {'import ms':>10}")
+        for pkg, ms in import_breakdown(env, args.top):
+            print(f"{pkg:30} {ms:>10}")
+
+
+if __name__ == "__main__":
+    main()
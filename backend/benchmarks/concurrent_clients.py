@@ -0,0 +1,104 @@
+# concurrent_clients.py
+"""Requests/sec and latency of a running API under N concurrent clients.
+
+Each client loops over --path in order, one request at a time, until
+--duration seconds have passed. To compare the sync and async routes, run
+the server at each revision against the same database and compare:
+
+    uvicorn main:app --port 8000                        # sync revision
+    python benchmarks/concurrent_clients.py --user-id 1 --output before.json
+    uvicorn main:app --port 8000                        # async revision
+    python benchmarks/concurrent_clients.py --user-id 1 --output after.json
+    python benchmarks/concurrent_clients.py --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/transactions/", "/analytics/dashboard", "/analytics/monthly_spending"]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def client(http, paths, user_id, deadline, results):
+    while time.perf_counter() < deadline:
+        for path in paths:
+            start = time.perf_counter()
+            try:
+                response = await http.get(path, params={"user_id": user_id})
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            results[path]["latencies"].append(time.perf_counter() - start)
+            results[path]["errors"] += not ok
+
+
+async def run(url: str, user_id: int, clients: int, duration: float, paths: list) -> dict:
+    results = {path: {"latencies": [], "errors": 0} for path in paths}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        await http.get(paths[0], params={"user_id": user_id})  # warm up
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(client(http, paths, user_id, deadline, results) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    report = {"url": url, "clients": clients, "duration": round(elapsed, 2), "paths": {}}
+    total = 0
+    for path, r in results.items():
+        n = len(r["latencies"])
+        total += n
+        report["paths"][path] = {
+            "requests": n,
+            "errors": r["errors"],
+            "rps": round(n / elapsed, 1),
+            "p50_ms": round(percentile(r["latencies"], 0.50) * 1000, 1),
+            "p99_ms": round(percentile(r["latencies"], 0.99) * 1000, 1),
+        }
+    report["rps"] = round(total / elapsed, 1)
+    return report
+
+
+def compare(before: dict, after: dict):
+    print(f"{'path':32} {'rps before':>11} {'rps after':>10} {'p99 before':>11} {'p99 after':>10}")
+    for path, b in before["paths"].items():
+        a = after["paths"].get(path)
+        if a:
+            print(f"{path:32} {b['rps']:>11} {a['rps']:>10} {b['p99_ms']:>10}ms {a['p99_ms']:>8}ms")
+    print(f"{'total':32} {before['rps']:>11} {after['rps']:>10}  ({after['rps'] / before['rps']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-client throughput benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--path", action="append", dest="paths", help=f"repeatable (default: {DEFAULT_PATHS})")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as b, open(args.compare[1]) as a:
+            compare(json.load(b), json.load(a))
+        return
+
+    report = asyncio.run(run(args.url, args.user_id, args.clients, args.duration, args.paths or DEFAULT_PATHS))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
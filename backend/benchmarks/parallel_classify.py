@@ -0,0 +1,76 @@
+# parallel_classify.py
+"""Classifier throughput with 1..N worker processes.
+
+Builds --rows distinct descriptions from the sample statement (a unique
+suffix per row, so neither the cache nor deduplication hides the work),
+then times classify_batch at each worker count with a cold cache. Pool
+start-up is excluded: each pool is warmed with one batch first, as it would
+be in a long-running server.
+
+    python benchmarks/parallel_classify.py --rows 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import pandas as pd
+
+import classifier_utils
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auto_labeled.csv")
+
+
+def make_descriptions(n: int) -> list:
+    base = pd.read_csv(SAMPLE)["description"].astype(str).tolist()
+    return [f"{base[i % len(base)]} REF{i:08d}" for i in range(n)]
+
+
+def run(descs: list, workers: int) -> tuple:
+    classifier_utils.PARALLEL_MIN_ROWS = 0
+    if workers > 1:
+        classifier_utils.classify_batch(descs[:workers * 10], workers=workers)  # spawn + model load
+    classifier_utils.CLASSIFY_CACHE.clear()
+    start = time.perf_counter()
+    labels = classifier_utils.classify_batch(descs, workers=workers)
+    return time.perf_counter() - start, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    descs = make_descriptions(args.rows)
+    # Cache entries per distinct row; make room for the whole batch
+    classifier_utils.CLASSIFY_CACHE.maxsize = max(classifier_utils.CLASSIFY_CACHE.maxsize, args.rows)
+    results, baseline, reference = [], None, None
+    print(f"{args.rows} rows, {os.cpu_count()} CPUs")
+    for workers in args.workers:
+        elapsed, labels = run(descs, workers)
+        if reference is None:
+            reference = labels
+        baseline = baseline or elapsed
+        row = {"workers": workers, "seconds": round(elapsed, 3),
+               "rows_per_second": round(args.rows / elapsed), "speedup": round(baseline / elapsed, 2),
+               "matches_serial": labels == reference}
+        results.append(row)
+        print(f"workers={workers:<3} {row['seconds']:>8.3f}s {row['rows_per_second']:>9} rows/s "
+              f"x{row['speedup']:<5} {'ok' if row['matches_serial'] else 'MISMATCH'}")
+    classifier_utils.shutdown_pool()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
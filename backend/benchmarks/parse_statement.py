@@ -0,0 +1,107 @@
+# parse_statement.py
+"""Date and amount parsing: inference + to_numeric vs statement_formats.
+
+Generates a statement body of --rows rows over --days distinct dates and
+--amounts distinct amounts (0: every row different) in plain and Indian
+(12,34,567.00) grouping, then times
+
+    baseline  pd.to_datetime(dayfirst=True) and pd.to_numeric, as the importer
+              did before the parsing stage (grouped amounts come out NaN)
+    stripped  baseline with separators removed first (no validation)
+    fast      StatementFormat.dates / .amounts (date format detected once,
+              each distinct value parsed once, separators handled)
+
+    python benchmarks/parse_statement.py --rows 500000 --date-format "%d %b %Y"
+"""
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")  # the baseline's dayfirst inference warns on some formats
+
+import numpy as np
+import pandas as pd
+
+import statement_formats
+
+
+def indian_grouping(value: float) -> str:
+    whole, frac = f"{value:.2f}".split(".")
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return ",".join(([head] if head else []) + groups + [tail]) + "." + frac
+
+
+def make_body(rows: int, days: int, distinct_amounts: int, date_format: str, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    calendar = pd.date_range("2024-01-01", periods=days).strftime(date_format)
+    amounts = np.round(rng.lognormal(7, 2, distinct_amounts or rows), 2)
+    if distinct_amounts:
+        amounts = rng.choice(amounts, rows)
+    text = [indian_grouping(a) if i % 3 == 0 else f"{a:.2f}" for i, a in enumerate(amounts)]
+    credit = rng.random(rows) < 0.3
+    return pd.DataFrame({
+        "date": pd.Series(rng.choice(calendar, rows), dtype=str),
+        "description": "UPI/PAYMENT",
+        "credit": pd.Series(np.where(credit, text, None), dtype=str),
+        "debit": pd.Series(np.where(credit, None, text), dtype=str),
+    }), amounts
+
+
+def baseline(df: pd.DataFrame):
+    dates = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
+    raw = df["credit"].where(df["credit"].notna(), df["debit"])
+    return dates, pd.to_numeric(raw, errors="coerce")
+
+
+def stripped(df: pd.DataFrame):
+    dates = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
+    raw = df["credit"].where(df["credit"].notna(), df["debit"])
+    return dates, pd.to_numeric(raw.str.replace(",", "", regex=False), errors="coerce")
+
+
+def fast(df: pd.DataFrame):
+    fmt = statement_formats.StatementFormat("bench", {"d": "date", "x": "description", "c": "credit", "b": "debit"})
+    fmt = fmt.for_file()
+    return fmt.dates(df), fmt.amounts(df)[0]
+
+
+def best_of(fn, df, repeat: int):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--amounts", type=int, default=5000, help="distinct amounts (0: all distinct)")
+    parser.add_argument("--date-format", default="%d/%m/%Y")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df, expected = make_body(args.rows, args.days, args.amounts, args.date_format)
+    truth = pd.to_datetime(df["date"], format=args.date_format)
+    print(f"{args.rows} rows, {args.days} distinct dates, {args.amounts or args.rows} distinct amounts, "
+          f"format {args.date_format!r}")
+    for name, fn in (("baseline", baseline), ("stripped", stripped), ("fast", fast)):
+        elapsed, (dates, amounts) = best_of(fn, df, args.repeat)
+        wrong_dates = int((dates != truth).sum())
+        bad_amounts = int((~np.isclose(amounts.to_numpy(dtype=float), expected)).sum())
+        print(f"{name:<9} {elapsed * 1000:>9.1f} ms  {args.rows / elapsed:>12,.0f} rows/s  "
+              f"wrong dates {wrong_dates:>7}  unparsed/wrong amounts {bad_amounts:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# suite.py
+"""End-to-end backend benchmarks on synthetic data.
+
+Creates --users users with --rows transactions between them (seeded, see
+synthetic.py) in a scratch SQLite database, or in --database-url (e.g. a
+local MySQL), and measures the app in-process:
+
+    import      POST /upload_csv/?stream=true per user: rows/s and stage timings
+    classifier  classify_batch on distinct descriptions, cold and warm cache
+    analytics   every GET /analytics/* endpoint (plus a transactions page):
+                p50/p99 latency, with the response cache bypassed and warm
+    memory      tracemalloc peak of one import, the classifier batch and one
+                uncached request per endpoint, run again after the timed
+                phases (tracing slows everything down), plus max RSS
+
+Results are written as JSON; --compare prints the change of every metric
+between two result files and exits non-zero on regressions past
+--threshold percent.
+
+    python benchmarks/suite.py --rows 100000 --users 10 --output before.json
+    python benchmarks/suite.py --rows 100000 --users 10 --output after.json
+    python benchmarks/suite.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+warnings.filterwarnings("ignore")
+
+import synthetic
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_stats(latencies: list) -> dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+class Phase:
+    """Wall time of one block, or with trace=True its tracemalloc peak."""
+
+    def __init__(self, results: dict, name: str, trace: bool = False):
+        self.results, self.name, self.trace = results, name, trace
+
+    def __enter__(self):
+        if self.trace:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.results["memory"][f"{self.name}_peak_mb"] = round(peak / 2 ** 20, 1)
+        else:
+            self.results["seconds"][self.name] = round(time.perf_counter() - self.start, 3)
+
+
+# --- Phases ---
+def signup(client, n: int) -> int:
+    user = client.post("/signup", json={"name": f"bench{n}", "mobile": f"9{n:09d}", "password": "bench"})
+    user.raise_for_status()
+    return user.json()["id"]
+
+
+def upload(client, user_id: int, path: str) -> dict:
+    with open(path, "rb") as f:
+        response = client.post("/upload_csv/", params={"user_id": user_id, "stream": "true"},
+                               files={"file": ("statement.csv", f, "text/csv")})
+    response.raise_for_status()
+    return response.json()
+
+
+def write_statements(args, workdir: str) -> list:
+    paths = []
+    for i in range(args.users):
+        rows = args.rows // args.users + (i < args.rows % args.users)
+        paths.append(os.path.join(workdir, f"statement_{i}.csv"))
+        synthetic.write_statement(paths[-1], rows, seed=args.seed + i, end=args.end_date, days=args.days)
+    return paths
+
+
+def bench_import(client, paths: list, results: dict) -> list:
+    user_ids, rows, stages, elapsed = [], 0, {}, 0.0
+    for i, path in enumerate(paths):
+        user_id = signup(client, i)
+        t0 = time.perf_counter()
+        body = upload(client, user_id, path)
+        elapsed += time.perf_counter() - t0
+        rows += body["rows_read"]
+        for stage, seconds in body["timings"].items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        user_ids.append(user_id)
+    results["import"] = {
+        "rows": rows,
+        "users": len(user_ids),
+        "rows_per_second": round(rows / elapsed, 1),
+        "request_seconds": round(elapsed, 3),
+        "stage_seconds": {k: round(v, 3) for k, v in stages.items()},
+    }
+    return user_ids
+
+
+def classifier_rows(args) -> list:
+    return [desc for _, desc, _, _ in synthetic.transactions(args.classifier_rows, seed=args.seed + 10_000)]
+
+
+def bench_classifier(descs: list, results: dict):
+    import classifier_utils
+    classifier_utils.CLASSIFY_CACHE.clear()
+    t0 = time.perf_counter()
+    classifier_utils.classify_batch(descs)
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    classifier_utils.classify_batch(descs)
+    warm = time.perf_counter() - t0
+    results["classifier"] = {
+        "rows": len(descs),
+        "cold_rows_per_second": round(len(descs) / cold, 1),
+        "warm_rows_per_second": round(len(descs) / warm, 1),
+        "model_version": classifier_utils.model_version(),
+    }
+
+
+def endpoints(app) -> list:
+    """(name, path, extra params) for every parameterless GET /analytics/* route."""
+    paths = sorted(route.path for route in app.routes
+                   if route.path.startswith("/analytics/") and "GET" in getattr(route, "methods", ())
+                   and "{" not in route.path)
+    return [(path, path, {}) for path in paths] + [("/transactions/?limit=100", "/transactions/", {"limit": 100})]
+
+
+def bench_analytics(client, app, user_id: int, requests: int, results: dict):
+    import analytics_cache
+    report = {}
+    for name, path, params in endpoints(app):
+        params = {"user_id": user_id, **params}
+        cold, warm = [], []
+        client.get(path, params=params).raise_for_status()  # first-call costs
+        for _ in range(requests):
+            analytics_cache.bump(user_id)  # every request computes
+            t0 = time.perf_counter()
+            client.get(path, params=params)
+            cold.append(time.perf_counter() - t0)
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            client.get(path, params=params)
+            warm.append(time.perf_counter() - t0)
+        report[name] = {"uncached": latency_stats(cold), "cached": latency_stats(warm)}
+    results["analytics"] = report
+
+
+def trace_memory(client, app, paths: list, descs: list, results: dict):
+    import analytics_cache, classifier_utils
+    user_id = signup(client, len(paths))
+    with Phase(results, "import", trace=True):
+        upload(client, user_id, paths[0])
+    classifier_utils.CLASSIFY_CACHE.clear()
+    with Phase(results, "classifier", trace=True):
+        classifier_utils.classify_batch(descs)
+    with Phase(results, "analytics", trace=True):
+        for _, path, params in endpoints(app):
+            analytics_cache.bump(user_id)
+            client.get(path, params={"user_id": user_id, **params})
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="finance-bench-")
+    # Everything below reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("IMPORT_SPOOL_DIR", os.path.join(workdir, "spool"))
+
+    results = {
+        "meta": {
+            "rows": args.rows, "users": args.users, "seed": args.seed, "days": args.days,
+            "end_date": args.end_date.isoformat(), "requests": args.requests,
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+        },
+        "seconds": {}, "memory": {},
+    }
+    with Phase(results, "generate"):
+        paths = write_statements(args, workdir)
+        descs = classifier_rows(args)
+    with Phase(results, "startup"):
+        from fastapi.testclient import TestClient
+        import main
+    with TestClient(main.app) as client:
+        with Phase(results, "import"):
+            user_ids = bench_import(client, paths, results)
+        with Phase(results, "classifier"):
+            bench_classifier(descs, results)
+        with Phase(results, "analytics"):
+            bench_analytics(client, main.app, user_ids[0], args.requests, results)
+        trace_memory(client, main.app, paths, descs, results)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["memory"]["max_rss_mb"] = round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+    return results
+
+
+# --- Comparing ---
+def flatten(results: dict) -> dict:
+    """{metric: value} for every number worth comparing."""
+    metrics = {
+        "import.rows_per_second": results["import"]["rows_per_second"],
+        "classifier.cold_rows_per_second": results["classifier"]["cold_rows_per_second"],
+        "classifier.warm_rows_per_second": results["classifier"]["warm_rows_per_second"],
+    }
+    for stage, seconds in results["import"]["stage_seconds"].items():
+        metrics[f"import.{stage}_seconds"] = seconds
+    for path, modes in results["analytics"].items():
+        for mode, stats in modes.items():
+            metrics[f"{path} {mode} p50_ms"] = stats["p50_ms"]
+            metrics[f"{path} {mode} p99_ms"] = stats["p99_ms"]
+    for name, mb in results["memory"].items():
+        metrics[f"memory.{name}"] = mb
+    return metrics
+
+
+def compare(before: dict, after: dict, threshold: float) -> int:
+    for key in ("rows", "users", "database"):
+        if before["meta"][key] != after["meta"][key]:
+            print(f"warning: {key} differs ({before['meta'][key]} vs {after['meta'][key]})")
+    b, a = flatten(before), flatten(after)
+    regressions = 0
+    print(f"{'metric':60} {'before':>10} {'after':>10} {'change':>8}")
+    for name in b:
+        if name not in a:
+            continue
+        old, new = b[name], a[name]
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if name.endswith("_per_second") else change
+        flag = ""
+        if worse > threshold:
+            flag, regressions = "  REGRESSION", regressions + 1
+        print(f"{name:60} {old:>10} {new:>10} {change:>+7.1f}%{flag}")
+    print(f"{regressions} regression(s) beyond {threshold}%")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend benchmark suite on synthetic data")
+    parser.add_argument("--rows", type=int, default=10_000, help="transactions across all users")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365, help="history the rows are spread over")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--classifier-rows", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=50, help="per analytics endpoint and mode")
+    parser.add_argument("--database-url", help="default: a scratch SQLite file")
+    parser.add_argument("--output", help="write the JSON results here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as b, open(args.compare[1]) as a:
+            sys.exit(compare(json.load(b), json.load(a), args.threshold))
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
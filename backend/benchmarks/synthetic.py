@@ -0,0 +1,144 @@
+# synthetic.py
+"""Seeded synthetic bank statements shaped like labeled_transactions.csv.
+
+Descriptions follow the shapes found in the sample statement (UPI payments
+through PhonePe handles, NEFT and self transfers, ATM and cash withdrawals,
+POS purchases, subsidies, bank charges) plus UPI payments to the merchants
+the keyword rules know, with random names, account numbers and references.
+The same seed and end date always give the same file. Files are written
+in the Indian Bank export layout (preamble, header, rows newest first), so
+they go through upload_csv like a real statement.
+
+    python benchmarks/synthetic.py --rows 100000 --seed 1 --output statement.csv
+"""
+
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+FIRST = ["RAMESH", "SURESH", "LAKSHMI", "VENKATA", "SATYA", "PAVAN", "GOWRI", "DURGA", "KRISHNA",
+         "MANI", "RAJU", "SRINIVAS", "PADMA", "NAGA", "ANIL", "SUNITHA", "RAVI", "KIRAN"]
+LAST = ["KOTIPALLI", "RONGALA", "PERURI", "GANDEPALLI", "YANDAPALLI", "CHITRADA", "KARRI", "BOMMIDI",
+        "ADAPA", "VARMA", "REDDY", "NAIDU", "RAO", "SHARMA"]
+IFSC = ["IDIB000C150", "SBIN0014172", "HDFC0003326", "CBIN0282546", "UTIB0001234", "UBIN0812345",
+        "CNRB0001234", "BARB0JAGGAM", "YESB0YBLUPI", "FDRL0001234"]
+HANDLES = ["ybl", "ibl", "axl", "okaxis", "okhdfcbank", "paytm"]
+BRANCHES = ["CHITRADA", "PITHAPURAM", "KAKINADA", "MUMBAI FORT", "ATM SERVICE BRANCH"]
+MERCHANTS = ["SWIGGY", "ZOMATO", "UBER", "OLA", "AMAZON", "NETFLIX", "Avenue Supermarts Ltd", "BHARATPE"]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+
+def _digits(rng, n: int) -> str:
+    return "".join(rng.choices("0123456789", k=n))
+
+
+def _person(rng) -> str:
+    return f"{rng.choice(['Mr ', 'Mrs ', ''])}{rng.choice(FIRST)}  {rng.choice(LAST)}"
+
+
+def upi_person(rng):
+    handle = f"{_digits(rng, 10)}@{rng.choice(HANDLES)}"
+    return (f"{rng.choice(IFSC)}/{_person(rng)}/XXXXX{rng.choice(['  ', _digits(rng, 5)])}/{handle} "
+            f"/UPI/{_digits(rng, 12)}/Payment from PhonePe /BRANCH :  ATM SERVICE BRANCH")
+
+
+def upi_merchant(rng):
+    merchant = rng.choice(MERCHANTS)
+    handle = f"{merchant.split()[0].lower()}.{_digits(rng, 8)}@{rng.choice(HANDLES)}"
+    return (f"{rng.choice(IFSC)}/{merchant}/XXXXX  /{handle} /UPI/{_digits(rng, 12)}/Pay to {merchant} "
+            f"/BRANCH :  ATM SERVICE BRANCH")
+
+
+def self_transfer(rng):
+    return f"WITHDRAWAL TRANSFER  TRANSFER TO {_digits(rng, 10)}  SELF /BRANCH :  {rng.choice(BRANCHES)}"
+
+
+def neft_in(rng):
+    return (f"TRANSFER FROM {_digits(rng, 11)}  NEFT/CSBK/CSBKN{_digits(rng, 17)}/MANIPAL BU/"
+            f"/BRANCH :  MUMBAI FORT")
+
+
+def transfer_in(rng):
+    return f"BY TRANSFER TRANSFER FROM {_digits(rng, 10)}TRF  /BRANCH :  {rng.choice(BRANCHES)}"
+
+
+def atm(rng):
+    return (f"TRAN DATE -(MMDD) {_digits(rng, 4)}  TRAN TIME -(HHMMSS) {_digits(rng, 6)}/SELF-"
+            f"{rng.choice(BRANCHES)}  EAST GODAVAR  IN/ATM WDL SEQ NO {_digits(rng, 12)} ATM ID "
+            f"S1AC{_digits(rng, 4)} /BRANCH :  CHITRADA")
+
+
+def cash(rng):
+    branch = rng.choice(BRANCHES)
+    if rng.random() < 0.5:
+        return f"CASH WDL/{branch}/BRANCH :  {branch}"
+    return f"CASH DEP/{branch}/Deposit by SELF  /BRANCH :  {branch}"
+
+
+def pos(rng):
+    return (f"BRANCH :  CHITRADA  /MERCHNT:{_digits(rng, 8)} {rng.choice(MERCHANTS)}  EAST GO IN POS TXN "
+            f"SEQ NO {_digits(rng, 12)} TERMINAL-ID {_digits(rng, 8)}  /")
+
+
+def subsidy(rng):
+    return (f"TRANSFER FROM {_digits(rng, 11)}NPCI CR.HPCL LPG SUBSIDY P{_digits(rng, 8)}CAD9  "
+            f"/BRANCH :  SERVICE BRANCH (CHENNAI)")
+
+
+def charges(rng):
+    return f"SMS_CHGS_{rng.choice(MONTHS)}-25_QT {_digits(rng, 17)}/BULK CHARGES  /"
+
+
+def emi(rng):
+    return (f"TRANSFER TO {_digits(rng, 11)}  BAJAJ EMI-2024{_digits(rng, 4)}-6Z8RDD{_digits(rng, 8)}-"
+            f"/BRANCH :  ALLAHABAD BANK CMS HUB")
+
+
+# (shape, weight, income share, typical amount); weights follow the sample's mix
+SHAPES = [
+    (upi_person, 40, 0.45, 2000), (upi_merchant, 15, 0.0, 600), (self_transfer, 8, 0.0, 20000),
+    (neft_in, 5, 1.0, 30000), (transfer_in, 4, 1.0, 50000), (atm, 9, 0.0, 2000), (cash, 7, 0.4, 5000),
+    (pos, 4, 0.0, 1500), (subsidy, 3, 1.0, 25), (charges, 2, 0.0, 20), (emi, 3, 0.0, 1450),
+]
+_WEIGHTS = [w for _, w, _, _ in SHAPES]
+
+
+def transactions(rows: int, seed: int = 1, end: date = None, days: int = 365):
+    """Yield (date, description, debit, credit) newest first."""
+    rng = random.Random(seed)
+    end = end or date.today()
+    for i in range(rows):
+        day = end - timedelta(days=i * days // max(rows, 1))
+        shape, _, income_share, typical = rng.choices(SHAPES, weights=_WEIGHTS)[0]
+        amount = f"{round(rng.lognormvariate(0, 0.8) * typical, 2):.2f}"
+        income = rng.random() < income_share
+        yield day, shape(rng), ("" if income else amount), (amount if income else "")
+
+
+def write_statement(path: str, rows: int, seed: int = 1, end: date = None, days: int = 365) -> int:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["", "", "", "", "", "Indian Bank", "", ""])
+        out.writerow(["", f"Statement Of Account (synthetic, seed {seed})", "", "", "", "", "", ""])
+        out.writerow([""] * 8)
+        out.writerow(["", "Txn Date", "", "Description", "Debit Amount", "", "Credit Amount", "Balance"])
+        for day, desc, debit, credit in transactions(rows, seed, end, days):
+            out.writerow(["", day.strftime("%d/%m/%Y"), "", desc, debit, "", credit, ""])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic bank statement")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365, help="history the rows are spread over")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="newest row's date (default: today)")
+    parser.add_argument("--output", default="synthetic_statement.csv")
+    args = parser.parse_args()
+    write_statement(args.output, args.rows, args.seed, args.end_date, args.days)
+    print(f"{args.rows} rows -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
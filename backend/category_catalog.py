@@ -0,0 +1,129 @@
+# category_catalog.py
+"""Default and per-user categories held in memory.
+
+The default categories (user_id NULL) are seeded at startup and never
+change afterwards, so each process reads them once. A user's own
+categories are read on first use and cached (CATEGORY_CACHE_SIZE users,
+CATEGORY_CACHE_TTL seconds). create_category and user deletion invalidate
+the entry. Listing, name lookups and validating a predicted category then
+take no queries.
+
+Caches are per process: with several workers, a category created through
+another worker shows up here after at most CATEGORY_CACHE_TTL seconds.
+"""
+
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select
+
+import models
+from cache_utils import LRUCache
+
+MAX_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", "50000"))
+TTL = float(os.getenv("CATEGORY_CACHE_TTL", "300"))
+
+# Predicted categories the user has no category for are stored as this
+FALLBACK = "Uncategorised"
+
+
+class Entry:
+    """Detached copy of a Category row, shared across sessions and threads."""
+
+    __slots__ = ("id", "name", "icon", "user_id")
+
+    def __init__(self, id: int, name: str, icon: str, user_id: int = None):
+        self.id, self.name, self.icon, self.user_id = id, name, icon, user_id
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.name, row.icon, row.user_id)
+
+
+class Catalog:
+    """The defaults merged with one user's own categories."""
+
+    def __init__(self, defaults: list, own: list):
+        self.entries = sorted(defaults + own, key=lambda e: e.id)
+        self._by_name = {}
+        # A user's own category shadows a default of the same name
+        for entry in own + defaults:
+            self._by_name.setdefault(entry.name, entry)
+
+    def get(self, name: str):
+        return self._by_name.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def validate(self, category: str) -> str:
+        return category if category in self._by_name else FALLBACK
+
+
+CACHE = LRUCache(maxsize=MAX_SIZE, ttl=TTL)
+
+_defaults = None
+_lock = threading.Lock()
+# Bumped by invalidate(); a load that started before the bump is not cached
+_generations = defaultdict(int)
+
+
+def _load_defaults(db) -> list:
+    global _defaults
+    if _defaults is None:
+        rows = db.scalars(select(models.Category).where(models.Category.user_id.is_(None))
+                          .order_by(models.Category.id))
+        entries = [Entry.from_row(r) for r in rows]
+        if not entries:
+            return entries  # not seeded yet; read again next time
+        with _lock:
+            if _defaults is None:
+                _defaults = entries
+    return _defaults
+
+
+def cached(user_id: int):
+    return CACHE.get(user_id)
+
+
+def for_user(db, user_id: int) -> Catalog:
+    """The user's catalog, loading their own categories on a cache miss (sync Session)."""
+    catalog = CACHE.get(user_id)
+    if catalog is None:
+        generation = _generations.get(user_id, 0)
+        rows = db.scalars(select(models.Category).where(models.Category.user_id == user_id)
+                          .order_by(models.Category.id))
+        defaults = _load_defaults(db)
+        catalog = Catalog(defaults, [Entry.from_row(r) for r in rows])
+        if not defaults:
+            return catalog  # not seeded yet; caching it would reject every default category
+        with _lock:
+            if _generations.get(user_id, 0) == generation:
+                CACHE.put(user_id, catalog)
+    return catalog
+
+
+def unknown(catalog: Catalog, names) -> list:
+    return sorted({n for n in names if n is not None and n not in catalog})
+
+
+def covering(db, user_id: int, names) -> Catalog:
+    """for_user, read again once if any of names is missing: it may have been
+    created through another worker since this one cached the catalog."""
+    catalog = for_user(db, user_id)
+    if unknown(catalog, names):
+        invalidate(user_id)
+        catalog = for_user(db, user_id)
+    return catalog
+
+
+def invalidate(user_id: int):
+    """Call after committing a change to the user's categories."""
+    with _lock:
+        _generations[user_id] += 1
+        CACHE.pop(user_id)
+
+
+def stats() -> dict:
+    return {**CACHE.stats(), "defaults": len(_defaults or ())}
@@ -1,14 +1,42 @@
 # classifier_utils.py
 
 import re
-import joblib
 import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import merchant_rules
+from cache_utils import LRUCache
+from instrumentation import span
+from lazy_imports import lazy_import
+from model_registry import registry
 
-# --- Load ML model only once ---
-TFIDF_PATH = "tfidf_vectorizer.joblib"
-MODEL_PATH = "nb_classifier.joblib"
-tfidf = joblib.load(TFIDF_PATH) if os.path.exists(TFIDF_PATH) else None
-clf = joblib.load(MODEL_PATH) if os.path.exists(MODEL_PATH) else None
+pd = lazy_import("pandas")
+
+# (merchant, category) per normalized description; see normalize_description
+CLASSIFY_CACHE = LRUCache(int(os.getenv("CLASSIFIER_CACHE_SIZE", "50000")))
+
+# Ceiling on classifier processes, whatever a caller asks for; the pool's size
+MAX_WORKERS = max(1, int(os.getenv("CLASSIFIER_MAX_WORKERS", str(os.cpu_count() or 1))))
+# Processes used by classify_batch for large batches (1 = classify in-process)
+WORKERS = min(int(os.getenv("CLASSIFIER_WORKERS", "1")), MAX_WORKERS)
+# Below this many uncached, rule-less descriptions, pickling costs more than it saves
+PARALLEL_MIN_ROWS = int(os.getenv("CLASSIFIER_PARALLEL_MIN_ROWS", "2000"))
+
+# --- ML model: loaded lazily by the registry, swapped in when a new version is published ---
+registry.on_swap(lambda bundle: CLASSIFY_CACHE.clear())
+
+def reload_models():
+    """Re-read the active model version and drop every cached prediction."""
+    registry.reload()
+    CLASSIFY_CACHE.clear()
+
+def model_version() -> str | None:
+    bundle = registry.current()
+    return bundle.version if bundle else None
+
+def cache_stats() -> dict:
+    return CLASSIFY_CACHE.stats()
 
 MERCHANT_TO_CAT = {
     'SWIGGY': 'Food', 'ZOMATO': 'Food', 'UBER': 'Transport',
@@ -18,58 +46,203 @@ MERCHANT_TO_CAT = {
 CATEGORIES = set(MERCHANT_TO_CAT.values()) | {
     'Transfer', 'Rent', 'Bills', 'Salary', 'Gift'
 }
+# Fixed scan order so the per-row and batch paths agree (set order varies per process)
+CATEGORY_ORDER = sorted(CATEGORIES)
+
+# Merchant keywords (built-in + merchant_rules.csv) first, then category names
+GLOBAL_RULES = merchant_rules.build_global_rules(MERCHANT_TO_CAT, CATEGORY_ORDER)
+
+def rules_for_user(db, user_id: int) -> merchant_rules.RuleSet:
+    return merchant_rules.rules_for_user(db, user_id, GLOBAL_RULES)
+
+# --- Precompiled patterns ---
+TRANSFER_RE = re.compile(r'\b(TRANSFER|NEFT|IMPS|RTGS|TRF|SELF|CREDIT|DEPOSIT|WITHDRAWAL)\b')
+IFSC_PREFIX_RE = re.compile(r'HDFC\d+/')
+UPI_REF_RE = re.compile(r'UPI/\d+')
+NOISE_WORDS_RE = re.compile(r'\b(BRANCH|ATM SERVICE BRANCH|PAYMENT FROM|NEFT|IMPS|RTGS|TRF|TRANSFER|TO|FROM|SELF|CREDIT|DEPOSIT|WITHDRAWAL)\b')
+SPACES_RE = re.compile(r'\s+')
+MASKED_ACCOUNT_RE = re.compile(r'^X{4,}')
+IFSC_RE = re.compile(r'^[A-Z]{4}\d{6}')
+UPI_HANDLE_RE = re.compile(r'\b([A-Z0-9._%+-]+@[A-Z]+)\b')
+PHONE_RE = re.compile(r'\b\d{10}\b')
 
 def is_transfer(desc: str) -> bool:
-    return bool(re.search(r'\b(TRANSFER|NEFT|IMPS|RTGS|TRF|SELF|CREDIT|DEPOSIT|WITHDRAWAL)\b', desc.upper()))
+    return bool(TRANSFER_RE.search(desc.upper()))
 
-def keyword_category(desc: str) -> str | None:
-    du = desc.upper()
-    for kw, cat in MERCHANT_TO_CAT.items():
-        if kw in du:
-            return cat
-    return None
+def keyword_category(desc: str, rules: merchant_rules.RuleSet = None) -> str | None:
+    hit = (rules or GLOBAL_RULES).match(desc.upper())
+    return hit[1] if hit else None
 
-def extract_merchant(desc: str) -> str:
+def normalize_description(desc: str) -> str:
+    """Upper-case and drop the per-transaction IFSC/UPI reference parts."""
     d = desc.upper()
-    d = re.sub(r'HDFC\d+/', '', d)
-    d = re.sub(r'UPI/\d+', '', d)
-    d = re.sub(r'\b(BRANCH|ATM SERVICE BRANCH|PAYMENT FROM|NEFT|IMPS|RTGS|TRF|TRANSFER|TO|FROM|SELF|CREDIT|DEPOSIT|WITHDRAWAL)\b', '', d)
-    d = re.sub(r'\s+', ' ', d).strip()
+    d = IFSC_PREFIX_RE.sub('', d)
+    return UPI_REF_RE.sub('', d)
+
+def extract_merchant(desc: str) -> str:
+    d = normalize_description(desc)
+    d = NOISE_WORDS_RE.sub('', d)
+    d = SPACES_RE.sub(' ', d).strip()
     raw_parts = d.split('/')[1:]
-    parts = [p.strip() for p in raw_parts if len(p.strip()) > 2 and not re.match(r'^X{4,}', p) and not re.match(r'^[A-Z]{4}\d{6}', p)]
+    parts = [p.strip() for p in raw_parts if len(p.strip()) > 2 and not MASKED_ACCOUNT_RE.match(p) and not IFSC_RE.match(p)]
     for part in parts:
         if any(char.isalpha() for char in part):  # must contain a letter
             return part.title()
-    upi_match = re.search(r'\b([A-Z0-9._%+-]+@[A-Z]+)\b', d)
+    upi_match = UPI_HANDLE_RE.search(d)
     if upi_match:
         return upi_match.group(1).title()
-    phone_match = re.search(r'\b\d{10}\b', d)
+    phone_match = PHONE_RE.search(d)
     if phone_match:
         return phone_match.group(0)
     words = d.split()
     return ' '.join(words[:4]).title() if words else "Unlabeled Transfer"
 
-def ml_category(desc: str) -> str:
-    if not tfidf or not clf:
+def ml_category(desc: str, bundle=None) -> str:
+    bundle = bundle or registry.current()
+    if not bundle:
         return "Uncategorised"
     try:
-        vec = tfidf.transform([desc])
-        return clf.predict(vec)[0]
+        return bundle.predict([desc])[0]
     except:
         return "Uncategorised"
 
-def classify_transaction_simple(desc: str):
-    D = desc.upper()
-    for m, cat in MERCHANT_TO_CAT.items():
-        if m in D:
-            return m.title(), cat
-    for cat in CATEGORIES:
-        if cat.upper() in D:
-            return cat, cat
+def _cache_key(bundle, rules: merchant_rules.RuleSet, desc: str):
+    return bundle.version if bundle else None, rules.version, normalize_description(desc)
+
+@span("classify.single")
+def classify_transaction_simple(desc: str, rules: merchant_rules.RuleSet = None):
+    rules = rules or GLOBAL_RULES
+    bundle = registry.current()
+    key = _cache_key(bundle, rules, desc)
+    result = CLASSIFY_CACHE.get(key)
+    if result is None:
+        result = _classify_uncached(desc, rules, bundle)
+        CLASSIFY_CACHE.put(key, result)
+    return result
+
+def _classify_uncached(desc: str, rules: merchant_rules.RuleSet, bundle=None):
+    hit = rules.match(desc.upper())
+    if hit:
+        return hit
     merchant = extract_merchant(desc)
     if is_transfer(desc):
         return merchant, "Transfer"
-    kw = keyword_category(desc)
-    if kw:
-        return merchant, kw
-    return merchant, ml_category(desc)
+    return merchant, ml_category(desc, bundle)
+
+
+def ml_category_batch(descs: list, bundle=None) -> list:
+    if not descs:
+        return []
+    bundle = bundle or registry.current()
+    if not bundle:
+        return ["Uncategorised"] * len(descs)
+    try:
+        return bundle.predict(descs)
+    except:
+        return ["Uncategorised"] * len(descs)
+
+@span("classify.batch")
+def classify_batch(descriptions, rules: merchant_rules.RuleSet = None, workers: int = None) -> list:
+    """Batch form of classify_transaction_simple with identical results.
+
+    Descriptions already in the cache are answered from it. For the rest,
+    rules are matched once per distinct description in a single automaton
+    pass, merchant extraction runs once per distinct description and every
+    row that falls through to the model is classified in one transform/predict.
+    With workers > 1 that fall-through part is sharded across a process pool.
+    """
+    descs = [str(d) for d in descriptions]
+    if not descs:
+        return []
+    rules = rules or GLOBAL_RULES
+    bundle = registry.current()
+    labels, pending = {}, {}
+    for d in dict.fromkeys(descs):
+        key = _cache_key(bundle, rules, d)
+        result = CLASSIFY_CACHE.get(key)
+        if result is not None:
+            labels[d] = result
+        else:
+            pending.setdefault(key, []).append(d)
+    if pending:
+        # One representative per normalized key, like the per-row path would cache
+        reps = [group[0] for group in pending.values()]
+        results = _classify_batch_uncached(reps, rules, bundle, min(workers or WORKERS, MAX_WORKERS))
+        for (key, group), result in zip(pending.items(), results):
+            CLASSIFY_CACHE.put(key, result)
+            for d in group:
+                labels[d] = result
+    return [labels[d] for d in descs]
+
+def _classify_batch_uncached(descs: list, rules: merchant_rules.RuleSet, bundle=None, workers: int = 1) -> list:
+    hits = [rules.match(d.upper()) for d in descs]
+    rest = [d for d, hit in zip(descs, hits) if hit is None]
+    if workers > 1 and len(rest) >= PARALLEL_MIN_ROWS:
+        labels = iter(_classify_parallel(rest, bundle, workers))
+    else:
+        labels = iter(_classify_unmatched(rest, bundle))
+    return [hit if hit is not None else next(labels) for hit in hits]
+
+def _classify_unmatched(descs: list, bundle=None) -> list:
+    """Merchant extraction, transfer check and model for descriptions no rule matched."""
+    if not descs:
+        return []
+    uniq = pd.Series(descs, dtype=object)
+    merchants = uniq.map(extract_merchant)
+    cats = pd.Series([None] * len(uniq), dtype=object)
+    cats[uniq.str.upper().str.contains(TRANSFER_RE)] = "Transfer"
+    ml_rows = cats.isna()
+    cats[ml_rows] = ml_category_batch(uniq[ml_rows].tolist(), bundle)
+    return list(zip(merchants, cats))
+
+
+# --- Process pool ---
+# Rules stay in the parent (user rule sets are per request and cheap to
+# match); workers only run the GIL-bound regex and TF-IDF/NB work.
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker():
+    registry.current()  # load the model once per process, not per shard
+
+def _classify_shard(descs: list, version):
+    bundle = registry.current()
+    if bundle and bundle.version != version:
+        bundle = registry.reload()
+    used = bundle.version if bundle else None
+    if used != version:
+        return used, None
+    return used, _classify_unmatched(descs, bundle)
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared pool, sized MAX_WORKERS once and never replaced, so a
+    caller holding it can always submit. With spawn (rather than fork: the
+    API process has threads -- DB pools, import jobs -- that a fork could
+    copy mid-lock) processes start on demand, only as many as the largest
+    concurrent fan-out needs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = None
+
+def _classify_parallel(descs: list, bundle, workers: int) -> list:
+    version = bundle.version if bundle else None
+    size = -(-len(descs) // workers)
+    shards = [descs[i:i + size] for i in range(0, len(descs), size)]
+    # map() yields in submission order, so the shards come back in order
+    results = []
+    for shard, (_, labels) in zip(shards, get_pool().map(_classify_shard, shards, [version] * len(shards))):
+        if labels is None:
+            # The worker could not load our model version; classify this shard here
+            labels = _classify_unmatched(shard, bundle)
+        results.extend(labels)
+    return results
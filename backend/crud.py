@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-import models, schemas
+from sqlalchemy import bindparam, delete, insert, or_, select, update
+from collections import defaultdict
+from datetime import date
+from types import SimpleNamespace
+import base64
+import models, schemas, category_catalog, merchant_rules, online_learning, rollups, user_cache, analytics_cache
 from fastapi import HTTPException
 
 # --- User functions ---
@@ -21,8 +25,26 @@ def get_user_by_mobile(db: Session, mobile: str):
 def get_user_by_id(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+# Everything keyed by user_id, children before the users row
+USER_OWNED_MODELS = (models.ImportJob, models.DailyRollup, models.MerchantRule, models.Category, models.Transaction)
+
+def delete_user(db: Session, user_id: int):
+    if not get_user_by_id(db, user_id):
+        return False
+    # Set-based deletes: the ORM cascade would load every transaction first
+    for model in USER_OWNED_MODELS:
+        db.execute(delete(model).where(model.user_id == user_id))
+    db.execute(delete(models.User).where(models.User.id == user_id))
+    db.commit()
+    analytics_cache.bump(user_id)
+    user_cache.forget(user_id)
+    merchant_rules.invalidate(user_id)
+    category_catalog.invalidate(user_id)
+    return True
+
 # --- Transactions ---
 def create_transaction(db: Session, txn: schemas.TransactionCreate, user_id: int):
+    require_categories(db, user_id, [txn.category])
     db_txn = models.Transaction(
         name=txn.name,
         amount=txn.amount,
@@ -32,14 +54,52 @@ def create_transaction(db: Session, txn: schemas.TransactionCreate, user_id: int
         user_id=user_id
     )
     db.add(db_txn)
+    rollups.apply(db, rollups.RollupDelta().add_txn(db_txn))
     db.commit()
+    analytics_cache.bump(user_id)
     db.refresh(db_txn)
     return db_txn
 
-def get_transactions(db: Session, user_id: int):
-    return db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id
-    ).order_by(models.Transaction.date.desc()).all()
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+def encode_cursor(txn) -> str:
+    """Opaque position after `txn` in (date desc, id desc) order."""
+    return base64.urlsafe_b64encode(f"{txn.date.isoformat()}|{txn.id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, txn_id = raw.split("|")
+        return date.fromisoformat(day), int(txn_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def transactions_query(user_id: int, after=None, start_date: date = None, end_date: date = None,
+                       type_: str = None, category: str = None):
+    """Newest first. `after` is a decoded cursor; seeking past it keeps every
+    page an index range scan on (user_id, date) instead of an OFFSET."""
+    T = models.Transaction
+    stmt = select(T).where(T.user_id == user_id)
+    if after is not None:
+        day, txn_id = after
+        # The plain `date <= day` bound is what lets the index seek to the cursor
+        stmt = stmt.where(T.date <= day, or_(T.date < day, T.id < txn_id))
+    if start_date:
+        stmt = stmt.where(T.date >= start_date)
+    if end_date:
+        stmt = stmt.where(T.date <= end_date)
+    if type_:
+        stmt = stmt.where(T.type_ == type_)
+    if category:
+        stmt = stmt.where(T.category == category)
+    return stmt.order_by(T.date.desc(), T.id.desc())
+
+def get_transactions(db: Session, user_id: int, limit: int = None, after=None, **filters):
+    stmt = transactions_query(user_id, after, **filters)
+    if limit:
+        stmt = stmt.limit(limit)
+    return db.scalars(stmt).all()
 
 def get_transaction_by_id(db: Session, txn_id: int, user_id: int):
     return db.query(models.Transaction).filter(
@@ -56,14 +116,26 @@ def update_transaction(db: Session, txn_id: int, txn: schemas.TransactionCreate,
     if not db_txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    corrected = txn.category != db_txn.category
+    if corrected:
+        # Only a new category: rows imported before validation keep theirs
+        require_categories(db, user_id, [txn.category])
+    delta = rollups.RollupDelta().remove_txn(db_txn)
+
     # Update fields
     db_txn.name = txn.name
     db_txn.amount = txn.amount
     db_txn.category = txn.category
     db_txn.date = txn.date
     db_txn.type_ = txn.type_
-    
+
+    rollups.apply(db, delta.add_txn(db_txn))
     db.commit()
+    analytics_cache.bump(user_id)
+    if corrected:
+        # After the commit, so a failed write teaches the model nothing. Only
+        # the merchant name is stored, so that is what the model learns from
+        online_learning.record_correction(txn.name, txn.category)
     db.refresh(db_txn)
     return db_txn
 
@@ -74,23 +146,163 @@ def delete_transaction(db: Session, txn_id: int, user_id: int):
     ).first()
     
     if db_txn:
+        rollups.apply(db, rollups.RollupDelta().remove_txn(db_txn))
         db.delete(db_txn)
         db.commit()
+        analytics_cache.bump(user_id)
         return True
     return False
 
+# --- Transaction batches ---
+TXN_FIELDS = ("name", "amount", "category", "date", "type_")
+
+def _txn_dict(row, **changes) -> dict:
+    return {"id": row.id, "user_id": row.user_id, **{f: getattr(row, f) for f in TXN_FIELDS}, **changes}
+
+def _new_category(op, rows: dict):
+    """The category an operation sets, checked as the single-row paths do:
+    always for a create, for an update only when it changes."""
+    if op.op == "create":
+        return op.data.category
+    if op.op == "update" and op.id in rows and op.data.category != rows[op.id].category:
+        return op.data.category
+    return None
+
+def apply_transaction_batch(db: Session, operations: list, user_id: int, atomic: bool = False) -> dict:
+    """Run schemas.TransactionBatch operations in one transaction, set-based.
+
+    One SELECT reads every update/delete target. Then deletes are one
+    DELETE ... WHERE id IN and updates one UPDATE ... WHERE id IN per
+    distinct set of new values (single-row updates touching the same
+    columns share one executemany). Creates are one flush: a multi-row
+    INSERT ... RETURNING where the backend has it, a row at a time on
+    MySQL. Rollups are one upsert. An operation whose target is missing
+    (404), or was already used by an earlier operation (409), or that names
+    a category the user doesn't have (422), fails on its own; with
+    atomic=True any failure leaves the whole batch unapplied.
+    """
+    T = models.Transaction
+    results = [{"index": i, "op": op.op, "id": getattr(op, "id", None)} for i, op in enumerate(operations)]
+    target_ids = {op.id for op in operations if op.op != "create"}
+    rows = {}
+    if target_ids:
+        columns = [T.id, T.user_id] + [getattr(T, f) for f in TXN_FIELDS]
+        rows = {r.id: r for r in db.execute(select(*columns).where(T.user_id == user_id, T.id.in_(target_ids)))}
+
+    new_categories = [_new_category(op, rows) for op in operations]
+    named = set(new_categories) - {None}
+    catalog = category_catalog.covering(db, user_id, named) if named else None
+
+    claimed = {}
+    for result, op, category in zip(results, operations, new_categories):
+        if category is not None and category not in catalog:
+            result.update(status=422, error=f"Unknown category {category!r}")
+        elif op.op == "create":
+            continue
+        elif op.id not in rows:
+            result.update(status=404, error="Transaction not found")
+        elif op.id in claimed:
+            result.update(status=409, error=f"Transaction already changed by operation {claimed[op.id]}")
+        else:
+            claimed[op.id] = result["index"]
+    failed = sum(1 for r in results if "status" in r)
+    if failed and atomic:
+        for result in results:
+            result.setdefault("status", 424)
+            result.setdefault("error", "Not applied: another operation in this atomic batch failed")
+        return {"applied": 0, "failed": failed, "results": results}
+
+    delta = rollups.RollupDelta()
+    deletes, updates, creates, corrections = [], defaultdict(list), [], []
+    for result, op in zip(results, operations):
+        if "status" in result:
+            continue
+        if op.op == "delete":
+            delta.remove_txn(rows[op.id])
+            deletes.append(op.id)
+            result["status"] = 200
+        elif op.op == "update":
+            row = rows[op.id]
+            changes = op.data.model_dump(exclude_none=True)
+            new = _txn_dict(row, **changes)
+            if changes:
+                delta.remove_txn(row).add_txn(SimpleNamespace(**new))
+                updates[tuple(sorted(changes.items()))].append(op.id)
+            if new["category"] != row.category:
+                corrections.append((new["name"], new["category"]))
+            result.update(status=200, transaction=new)
+        else:
+            txn = models.Transaction(**op.data.model_dump(), user_id=user_id)
+            delta.add_txn(txn)
+            creates.append((result, txn))
+
+    table = T.__table__
+    if deletes:
+        db.execute(delete(table).where(table.c.user_id == user_id, table.c.id.in_(deletes)))
+    singles = defaultdict(list)
+    for changes, ids in updates.items():
+        if len(ids) > 1:
+            db.execute(update(table).where(table.c.user_id == user_id, table.c.id.in_(ids)).values(dict(changes)))
+        else:
+            singles[tuple(k for k, _ in changes)].append({"b_id": ids[0], **{f"b_{k}": v for k, v in changes}})
+    for keys, params in singles.items():
+        stmt = update(table).where(table.c.user_id == user_id, table.c.id == bindparam("b_id"))
+        db.execute(stmt.values({k: bindparam(f"b_{k}") for k in keys}), params)
+    if creates:
+        db.add_all(txn for _, txn in creates)
+        db.flush()
+        for result, txn in creates:
+            result.update(status=201, id=txn.id, transaction=_txn_dict(txn))
+    rollups.apply(db, delta)
+    db.commit()
+    if len(results) > failed:
+        analytics_cache.bump(user_id)
+    # After the commit, so a failed write teaches the model nothing. Only the
+    # merchant name is stored, so that is what the model learns from
+    for name, category in corrections:
+        online_learning.record_correction(name, category)
+    return {"applied": len(results) - failed, "failed": failed, "results": results}
+
 # --- Categories ---
+DEFAULT_CATEGORIES = [
+    {"name": "Food", "icon": "🍽️"},
+    {"name": "Transport", "icon": "🚌"},
+    {"name": "Shopping", "icon": "🛍️"},
+    {"name": "Entertainment", "icon": "🎬"},
+    {"name": "Bills", "icon": "💡"},
+    {"name": "Salary", "icon": "💰"},
+    {"name": "Gift", "icon": "🎁"},
+    {"name": "Transfer", "icon": "🔄"},
+    {"name": "Uncategorised", "icon": "❓"},
+    {"name": "Medical", "icon": "🏥"},
+    {"name": "Education", "icon": "📚"},
+    {"name": "Recharge", "icon": "📲"},
+    {"name": "Investment", "icon": "📈"},
+    {"name": "Loan", "icon": "💸"},
+    {"name": "Travel", "icon": "✈️"},
+    {"name": "Fuel", "icon": "⛽"},
+    {"name": "Groceries", "icon": "🛒"},
+    {"name": "Healthcare", "icon": "🩺"},
+    {"name": "Insurance", "icon": "📑"},
+    {"name": "Rent", "icon": "🏠"},  # a classifier category (see classifier_utils.CATEGORIES)
+]
+
+def seed_default_categories(db: Session) -> int:
+    """Insert the missing defaults (user_id NULL) in one statement; returns how many."""
+    existing = set(db.scalars(select(models.Category.name).where(models.Category.user_id.is_(None))))
+    missing = [{**cat, "user_id": None} for cat in DEFAULT_CATEGORIES if cat["name"] not in existing]
+    if missing:
+        db.execute(insert(models.Category), missing)
+        db.commit()
+    return len(missing)
+
 def get_categories(db: Session, user_id: int):
     """Get all categories available to user (default + user-specific)"""
-    return db.query(models.Category).filter(
-        or_(
-            models.Category.user_id == None,  # Default categories
-            models.Category.user_id == user_id  # User-specific categories
-        )
-    ).all()
+    return category_catalog.for_user(db, user_id).entries
 
 def create_category(db: Session, cat: schemas.CategoryCreate, user_id: int):
     # Check if category already exists for this user
+    # Against the DB, not the catalog: another worker's cached copy may be stale
     existing = db.query(models.Category).filter(
         models.Category.name == cat.name,
         models.Category.user_id == user_id
@@ -106,14 +318,44 @@ def create_category(db: Session, cat: schemas.CategoryCreate, user_id: int):
     )
     db.add(db_cat)
     db.commit()
+    category_catalog.invalidate(user_id)
     db.refresh(db_cat)
     return db_cat
 
 def get_category_by_name(db: Session, name: str, user_id: int):
-    return db.query(models.Category).filter(
-        models.Category.name == name,
+    return category_catalog.for_user(db, user_id).get(name)
+
+def require_categories(db: Session, user_id: int, names):
+    """422 unless the user has every named category (None is skipped)."""
+    missing = category_catalog.unknown(category_catalog.covering(db, user_id, names), names)
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Unknown category {', '.join(map(repr, missing))}")
+
+# --- Merchant rules ---
+def get_merchant_rules(db: Session, user_id: int):
+    """Get all rules applied to user (shared + user-specific)"""
+    return db.query(models.MerchantRule).filter(
         or_(
-            models.Category.user_id == None,
-            models.Category.user_id == user_id
+            models.MerchantRule.user_id == None,
+            models.MerchantRule.user_id == user_id
         )
-    ).first()
\ No newline at end of file
+    ).order_by(models.MerchantRule.id).all()
+
+def create_merchant_rule(db: Session, rule: schemas.MerchantRuleCreate, user_id: int):
+    keyword = rule.keyword.strip()
+    if not keyword:
+        raise HTTPException(status_code=400, detail="Keyword must not be empty")
+    # A rule for a category the user lacks would send its rows to Uncategorised on import
+    require_categories(db, user_id, [rule.category])
+
+    db_rule = models.MerchantRule(
+        keyword=keyword,
+        category=rule.category,
+        merchant=rule.merchant,
+        user_id=user_id
+    )
+    db.add(db_rule)
+    db.commit()
+    db.refresh(db_rule)
+    merchant_rules.add_user_rule(user_id, db_rule.keyword, db_rule.category, db_rule.merchant)
+    return db_rule
@@ -0,0 +1,206 @@
+# crud_async.py
+"""AsyncSession versions of the crud.py functions, used by the async routes.
+
+Behaviour matches crud.py one for one. Rollup deltas go through
+rollups.apply on the session's sync facade (AsyncSession.run_sync), so both
+write paths share the same upsert code.
+"""
+
+from fastapi import HTTPException
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models, schemas, crud, category_catalog, merchant_rules, online_learning, rollups, user_cache, analytics_cache
+from database import AsyncSessionLocal
+
+# --- User functions ---
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    db_user = models.User(
+        name=user.name,
+        mobile=user.mobile,
+        password=user.password
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def get_user_by_mobile(db: AsyncSession, mobile: str):
+    return await db.scalar(select(models.User).where(models.User.mobile == mobile).limit(1))
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def delete_user(db: AsyncSession, user_id: int):
+    if not await get_user_by_id(db, user_id):
+        return False
+    # Set-based deletes: the ORM cascade would load every transaction first
+    for model in crud.USER_OWNED_MODELS:
+        await db.execute(delete(model).where(model.user_id == user_id))
+    await db.execute(delete(models.User).where(models.User.id == user_id))
+    await db.commit()
+    analytics_cache.bump(user_id)
+    user_cache.forget(user_id)
+    merchant_rules.invalidate(user_id)
+    category_catalog.invalidate(user_id)
+    return True
+
+# --- Transactions ---
+async def create_transaction(db: AsyncSession, txn: schemas.TransactionCreate, user_id: int):
+    await require_categories(db, user_id, [txn.category])
+    db_txn = models.Transaction(
+        name=txn.name,
+        amount=txn.amount,
+        category=txn.category,
+        date=txn.date,
+        type_=txn.type_,
+        user_id=user_id
+    )
+    db.add(db_txn)
+    await db.run_sync(rollups.apply, rollups.RollupDelta().add_txn(db_txn))
+    await db.commit()
+    analytics_cache.bump(user_id)
+    await db.refresh(db_txn)
+    return db_txn
+
+async def get_transactions(db: AsyncSession, user_id: int, limit: int = None, after=None, **filters):
+    stmt = crud.transactions_query(user_id, after, **filters)
+    if limit:
+        stmt = stmt.limit(limit)
+    result = await db.scalars(stmt)
+    return result.all()
+
+async def stream_transactions(user_id: int, after=None, batch_size: int = crud.STREAM_BATCH_SIZE, **filters):
+    """Yield rows from a server-side cursor, batch_size at a time.
+
+    Opens its own session: a StreamingResponse body runs after the request's
+    dependencies may already have been cleaned up.
+    """
+    stmt = crud.transactions_query(user_id, after, **filters).execution_options(yield_per=batch_size)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(stmt)
+        async for txn in result:
+            yield txn
+
+async def get_transaction_by_id(db: AsyncSession, txn_id: int, user_id: int):
+    return await db.scalar(select(models.Transaction).where(
+        models.Transaction.id == txn_id,
+        models.Transaction.user_id == user_id
+    ))
+
+async def update_transaction(db: AsyncSession, txn_id: int, txn: schemas.TransactionCreate, user_id: int):
+    db_txn = await get_transaction_by_id(db, txn_id, user_id)
+
+    if not db_txn:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    corrected = txn.category != db_txn.category
+    if corrected:
+        # Only a new category: rows imported before validation keep theirs
+        await require_categories(db, user_id, [txn.category])
+    delta = rollups.RollupDelta().remove_txn(db_txn)
+
+    # Update fields
+    db_txn.name = txn.name
+    db_txn.amount = txn.amount
+    db_txn.category = txn.category
+    db_txn.date = txn.date
+    db_txn.type_ = txn.type_
+
+    await db.run_sync(rollups.apply, delta.add_txn(db_txn))
+    await db.commit()
+    analytics_cache.bump(user_id)
+    if corrected:
+        # After the commit, so a failed write teaches the model nothing. Only
+        # the merchant name is stored, so that is what the model learns from
+        online_learning.record_correction(txn.name, txn.category)
+    await db.refresh(db_txn)
+    return db_txn
+
+async def delete_transaction(db: AsyncSession, txn_id: int, user_id: int):
+    db_txn = await get_transaction_by_id(db, txn_id, user_id)
+
+    if db_txn:
+        await db.run_sync(rollups.apply, rollups.RollupDelta().remove_txn(db_txn))
+        await db.delete(db_txn)
+        await db.commit()
+        analytics_cache.bump(user_id)
+        return True
+    return False
+
+async def apply_transaction_batch(db: AsyncSession, operations: list, user_id: int, atomic: bool = False) -> dict:
+    # One run_sync for the whole batch: every statement is set-based already
+    return await db.run_sync(crud.apply_transaction_batch, operations, user_id, atomic)
+
+# --- Categories ---
+async def user_catalog(db: AsyncSession, user_id: int) -> category_catalog.Catalog:
+    """Cached catalog without a trip through run_sync; loads it on a miss."""
+    catalog = category_catalog.cached(user_id)
+    if catalog is None:
+        catalog = await db.run_sync(category_catalog.for_user, user_id)
+    return catalog
+
+async def require_categories(db: AsyncSession, user_id: int, names):
+    """crud.require_categories; no run_sync when the cached catalog has them all."""
+    catalog = category_catalog.cached(user_id)
+    if catalog is None or category_catalog.unknown(catalog, names):
+        await db.run_sync(crud.require_categories, user_id, names)
+
+async def get_categories(db: AsyncSession, user_id: int):
+    """Get all categories available to user (default + user-specific)"""
+    return (await user_catalog(db, user_id)).entries
+
+async def create_category(db: AsyncSession, cat: schemas.CategoryCreate, user_id: int):
+    # Check if category already exists for this user
+    # Against the DB, not the catalog: another worker's cached copy may be stale
+    existing = await db.scalar(select(models.Category).where(
+        models.Category.name == cat.name,
+        models.Category.user_id == user_id
+    ).limit(1))
+
+    if existing:
+        raise HTTPException(status_code=400, detail="Category already exists")
+
+    db_cat = models.Category(
+        name=cat.name,
+        icon=cat.icon,
+        user_id=user_id
+    )
+    db.add(db_cat)
+    await db.commit()
+    category_catalog.invalidate(user_id)
+    await db.refresh(db_cat)
+    return db_cat
+
+async def get_category_by_name(db: AsyncSession, name: str, user_id: int):
+    return (await user_catalog(db, user_id)).get(name)
+
+# --- Merchant rules ---
+async def get_merchant_rules(db: AsyncSession, user_id: int):
+    """Get all rules applied to user (shared + user-specific)"""
+    result = await db.scalars(select(models.MerchantRule).where(
+        or_(
+            models.MerchantRule.user_id == None,
+            models.MerchantRule.user_id == user_id
+        )
+    ).order_by(models.MerchantRule.id))
+    return result.all()
+
+async def create_merchant_rule(db: AsyncSession, rule: schemas.MerchantRuleCreate, user_id: int):
+    keyword = rule.keyword.strip()
+    if not keyword:
+        raise HTTPException(status_code=400, detail="Keyword must not be empty")
+    # A rule for a category the user lacks would send its rows to Uncategorised on import
+    await require_categories(db, user_id, [rule.category])
+
+    db_rule = models.MerchantRule(
+        keyword=keyword,
+        category=rule.category,
+        merchant=rule.merchant,
+        user_id=user_id
+    )
+    db.add(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+    merchant_rules.add_user_rule(user_id, db_rule.keyword, db_rule.category, db_rule.merchant)
+    return db_rule
@@ -1,14 +1,122 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# --- Pool configuration ---
+# Each engine (sync and async) gets its own pool of this size.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Below MySQL's wait_timeout (and any proxy idle timeout) so the server never
+# closes a connection the pool still thinks is alive
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+
+class PoolStats:
+    """Counters updated by an instrumented pool on every checkout."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited = 0          # checkouts that took longer than 1 ms
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.checked_out_peak = 0
+        self.overflow_peak = 0
+
+    def record(self, pool, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if wait > 0.001:
+                self.waited += 1
+            overflow = pool.overflow()
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.overflow_peak = max(self.overflow_peak, overflow)
+            self.checked_out_peak = max(self.checked_out_peak, pool.checkedout())
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "checkouts": self.checkouts,
+                "waited": self.waited,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "timeouts": self.timeouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "overflow_peak": self.overflow_peak,
+                "checked_out_peak": self.checked_out_peak,
+            }
+
+
+class _TimedPoolMixin:
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(self, 0.0, timed_out=True)
+            raise
+        self.stats.record(self, time.perf_counter() - start)
+        return conn
+
+
+def instrumented_pool(base):
+    """A subclass of `base` with its own PoolStats. Pool.recreate() builds
+    from self.__class__, so the stats survive dispose() and invalidation."""
+    return type(f"Timed{base.__name__}", (_TimedPoolMixin, base), {"stats": PoolStats()})
+
+
+def pool_options(url: str, base) -> dict:
+    # In-memory SQLite needs its single shared connection, not a queue pool
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": instrumented_pool(base),
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    if getattr(pool, "stats", None) is None:
+        return {"pool": type(pool).__name__}
+    return pool.stats.snapshot(pool)
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, QueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -17,4 +125,43 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- Async engine (same database, asyncio driver) ---
+# Created on first use, because creating it imports the async driver
+# (aiomysql). Sync-only tools like rollups.py, migrate_native_types.py and
+# the benchmarks never touch it, so they don't need that driver installed.
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_url(url: str) -> str:
+    """mysql+pymysql://... -> mysql+aiomysql://... (override with ASYNC_DATABASE_URL)."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+_async = None  # (async_engine, AsyncSessionLocal)
+_async_lock = threading.Lock()
+
+def _async_setup():
+    global _async
+    with _async_lock:
+        if _async is None:
+            async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                               **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool))
+            _async = async_engine, async_sessionmaker(async_engine, class_=AsyncSession,
+                                                      autoflush=False, expire_on_commit=False)
+    return _async
+
+def __getattr__(name):
+    # database.async_engine / database.AsyncSessionLocal, built on first access
+    if name == "async_engine":
+        return _async_setup()[0]
+    if name == "AsyncSessionLocal":
+        return _async_setup()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def get_async_db():
+    async with _async_setup()[1]() as db:
+        yield db
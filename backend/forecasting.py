@@ -0,0 +1,182 @@
+# forecasting.py
+"""Next-month expense forecasts, vectorized over every series at once.
+
+A series is one (category) for a single user, or one (user_id, category)
+in a batch. Series are the columns of a month x series matrix, with a mask
+for the months that have data. Each model is a few NumPy passes over that
+matrix, so one user's categories and a whole user table cost about the same
+number of Python steps.
+
+    python forecasting.py batch [--model linear] [--user-id N] [--output forecasts.jsonl]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import date
+
+import analytics
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+HISTORY_MONTHS = 12
+DEFAULT_MODEL = "linear"
+
+MODELS = {}
+
+
+def register(name: str, min_points: int = 1):
+    """Register fn(matrix, target) -> per-column forecast. Series with fewer
+    than min_points observed months get no forecast."""
+    def wrap(fn):
+        MODELS[name] = (fn, min_points)
+        return fn
+    return wrap
+
+
+def month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+class SeriesMatrix:
+    """values[t, k] is series k's total in month months[t]; mask marks data."""
+
+    def __init__(self, keys: list, months: np.ndarray, values: np.ndarray, mask: np.ndarray):
+        self.keys = keys
+        self.months = months
+        self.values = values
+        self.mask = mask
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: iterable of (key, month_index, amount); amounts in the same
+        (key, month) are summed."""
+        columns, cells = {}, {}
+        for key, month, amount in rows:
+            k = columns.setdefault(key, len(columns))
+            cells[(month, k)] = cells.get((month, k), 0.0) + float(amount)
+        if not cells:
+            return cls([], np.zeros(0, dtype=np.int64), np.zeros((0, 0)), np.zeros((0, 0), dtype=bool))
+        month_ids, col_ids = np.array(list(cells), dtype=np.int64).T
+        first = month_ids.min()
+        months = np.arange(first, month_ids.max() + 1)
+        values = np.zeros((len(months), len(columns)))
+        mask = np.zeros_like(values, dtype=bool)
+        values[month_ids - first, col_ids] = list(cells.values())
+        mask[month_ids - first, col_ids] = True
+        return cls(list(columns), months, values, mask)
+
+    def counts(self) -> np.ndarray:
+        return self.mask.sum(axis=0)
+
+    def last_observed(self) -> np.ndarray:
+        """Row index of each series' latest observed month."""
+        rows = np.arange(len(self.months))[:, None]
+        return np.where(self.mask, rows, -1).max(axis=0)
+
+
+# --- Models ---
+@register("linear", min_points=2)
+def linear(m: SeriesMatrix, target: np.ndarray) -> np.ndarray:
+    """Ordinary least squares on (month, total) per series, in closed form."""
+    x = (m.months - m.months[0]).astype(float)[:, None]
+    w = m.mask.astype(float)
+    y = m.values * w
+    n = w.sum(axis=0)
+    sx, sy = (w * x).sum(axis=0), y.sum(axis=0)
+    sxx, sxy = (w * x * x).sum(axis=0), (x * y).sum(axis=0)
+    denom = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom != 0, (n * sxy - sx * sy) / denom, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, 0.0)
+    return intercept + slope * (target - m.months[0])
+
+
+@register("ewma")
+def ewma(m: SeriesMatrix, target: np.ndarray, alpha: float = 0.5) -> np.ndarray:
+    """Exponentially weighted mean of the observed months (gaps are skipped)."""
+    level = np.full(m.values.shape[1], np.nan)
+    for t in range(len(m.months)):  # at most HISTORY_MONTHS + 1 steps
+        observed = m.mask[t]
+        updated = np.where(np.isnan(level), m.values[t], alpha * m.values[t] + (1 - alpha) * level)
+        level = np.where(observed, updated, level)
+    return level
+
+
+@register("seasonal_naive")
+def seasonal_naive(m: SeriesMatrix, target: np.ndarray, season: int = 12) -> np.ndarray:
+    """Same month last season if it was observed, else the latest month."""
+    cols = np.arange(m.values.shape[1])
+    last = m.last_observed()
+    forecast = m.values[last, cols]
+    row = target - season - m.months[0]
+    valid = (row >= 0) & (row < len(m.months))
+    row = np.clip(row, 0, max(len(m.months) - 1, 0))
+    seasonal = valid & m.mask[row, cols]
+    return np.where(seasonal, m.values[row, cols], forecast)
+
+
+def forecast(matrix: SeriesMatrix, model: str = DEFAULT_MODEL, **params) -> dict:
+    """{key: forecast for the month after the series' last observed month}."""
+    fn, min_points = MODELS[model]
+    if not matrix.keys:
+        return {}
+    target = matrix.months[matrix.last_observed()] + 1
+    values = np.maximum(fn(matrix, target, **params), 0)
+    keep = matrix.counts() >= min_points
+    return {key: round(float(v), 2) for key, v, ok in zip(matrix.keys, values, keep) if ok}
+
+
+# --- Entry points ---
+def predict_user(db, user_id: int, model: str = DEFAULT_MODEL, today: date = None) -> dict:
+    """{category: next month's expense} from the last HISTORY_MONTHS of rollups."""
+    since = analytics.months_ago(today or date.today(), HISTORY_MONTHS)
+    rows = db.execute(analytics.monthly_expense_query(user_id, since))
+    return forecast(SeriesMatrix.from_rows((c, month_index(d), t) for d, c, t in rows), model)
+
+
+def predict_users(db, user_ids: list, model: str = DEFAULT_MODEL, today: date = None) -> dict:
+    """{user_id: {category: forecast}}, all users solved as one matrix."""
+    since = analytics.months_ago(today or date.today(), HISTORY_MONTHS)
+    rows = db.execute(analytics.monthly_expense_users_query(user_ids, since))
+    matrix = SeriesMatrix.from_rows(((u, c), month_index(d), t) for u, d, c, t in rows)
+    result = {uid: {} for uid in user_ids}
+    for (uid, category), value in forecast(matrix, model).items():
+        result[uid][category] = value
+    return result
+
+
+def main():
+    import models
+    from database import SessionLocal
+    from sqlalchemy import select
+
+    parser = argparse.ArgumentParser(description="Batch next-month expense forecasts")
+    parser.add_argument("command", choices=["batch"])
+    parser.add_argument("--model", default=DEFAULT_MODEL, choices=sorted(MODELS))
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=2000, help="users per matrix")
+    parser.add_argument("--output", help="JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    today = date.today()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    with SessionLocal() as db:
+        if args.user_id is not None:
+            user_ids = [args.user_id]
+        else:
+            user_ids = list(db.scalars(select(models.User.id).order_by(models.User.id)))
+        for start in range(0, len(user_ids), args.chunk_size):
+            chunk = user_ids[start:start + args.chunk_size]
+            for uid, predictions in predict_users(db, chunk, args.model, today).items():
+                out.write(json.dumps({"user_id": uid, "model": args.model, "as_of": today.isoformat(),
+                                      "predictions": predictions}) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
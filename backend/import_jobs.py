@@ -0,0 +1,223 @@
+# import_jobs.py
+"""Background CSV imports that resume where they stopped.
+
+POST /upload_csv/?background=true spools the upload to IMPORT_SPOOL_DIR,
+records an ImportJob and returns its id right away. A thread pool
+(IMPORT_WORKERS) runs the job through the same parse / classify / dedup /
+insert stages as importer.import_statement_stream, one batch per
+transaction. Each batch's progress counters are committed in the same
+transaction as its rows. After a crash the job skips the rows it already
+committed and continues from there.
+
+A worker must claim a job before running it: an UPDATE that only matches
+queued jobs, or running jobs whose heartbeat is older than
+IMPORT_JOB_STALE_SECONDS. Every batch commit checks that the worker still
+owns the job, so two processes never import the same rows.
+"""
+
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+import analytics_cache
+import importer
+import models
+import statement_formats
+from database import SessionLocal
+from model_registry import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(BASE_DIR, "import_spool"))
+WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+STALE_SECONDS = float(os.getenv("IMPORT_JOB_STALE_SECONDS", "120"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+J = models.ImportJob
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class LostClaim(Exception):
+    """Another worker took the job over (our heartbeat went stale)."""
+
+
+def _now():
+    return datetime.utcnow()
+
+
+# --- Submitting ---
+def spool(fileobj) -> str:
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=".csv", dir=SPOOL_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    return path
+
+
+def create_job(db, user_id: int, fileobj, filename: str = None,
+               batch_size: int = importer.DEFAULT_BATCH_SIZE,
+               chunk_size: int = importer.DEFAULT_CHUNK_SIZE, statement_format: str = None):
+    path = spool(fileobj)
+    job = J(user_id=user_id, status=QUEUED, filename=filename, spool_path=path,
+            statement_format=statement_format, batch_size=batch_size, chunk_size=chunk_size,
+            created_at=_now())
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    submit(job.id)
+    return job
+
+
+def submit(job_id: int):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="import-job")
+    _executor.submit(run_job, job_id)
+
+
+def resume_pending():
+    """Requeue jobs left queued or running by a previous process."""
+    with SessionLocal() as db:
+        jobs = db.execute(select(J.id, J.status, J.heartbeat_at).where(J.status.in_([QUEUED, RUNNING]))).all()
+    stale_before = _now() - timedelta(seconds=STALE_SECONDS)
+    for job_id, status, heartbeat in jobs:
+        if status == RUNNING and heartbeat and heartbeat > stale_before:
+            # Maybe still alive elsewhere; look again once its heartbeat could be stale
+            delay = (heartbeat - stale_before).total_seconds() + 1
+            timer = threading.Timer(delay, submit, [job_id])
+            timer.daemon = True
+            timer.start()
+        else:
+            submit(job_id)
+    return len(jobs)
+
+
+# --- Running ---
+def claim(db, job_id: int) -> bool:
+    now = _now()
+    stale_before = now - timedelta(seconds=STALE_SECONDS)
+    result = db.execute(
+        update(J)
+        .where(J.id == job_id, or_(J.status == QUEUED,
+                                   and_(J.status == RUNNING, J.heartbeat_at < stale_before)))
+        .values(status=RUNNING, worker=WORKER_ID, heartbeat_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _advance(db, job_id: int, **changes):
+    """Add counter deltas and renew the heartbeat, only if we still own the job."""
+    values = {name: getattr(J, name) + delta for name, delta in changes.items()}
+    result = db.execute(update(J).where(J.id == job_id, J.worker == WORKER_ID)
+                        .values(heartbeat_at=_now(), **values))
+    if result.rowcount != 1:
+        raise LostClaim(job_id)
+
+
+def process(db, job) -> None:
+    if job.started_at is None:
+        job.started_at = _now()
+    if job.max_id is None:
+        job.max_id = importer.max_transaction_id(db, job.user_id) or 0
+    db.commit()
+
+    seen = 0
+    with open(job.spool_path, "rb") as f:
+        fmt = statement_formats.get(job.statement_format) if job.statement_format else None
+        fmt, chunks = importer.iter_statement_chunks(f, job.batch_size, fmt)
+        if job.statement_format is None:
+            job.statement_format = fmt.name
+            db.commit()
+        for df in chunks:
+            start, seen = seen, seen + len(df)
+            done = job.rows_read
+            if seen <= done:
+                continue  # committed by an earlier run
+            if start < done:
+                df = df.iloc[done - start:]
+            stats = importer.ImportStats()
+            rows = importer.normalize_rows(df, fmt)
+            importer.import_rows(db, rows, job.user_id, stats, job.chunk_size, job.max_id)
+            _advance(db, job.id, rows_read=len(df), rows_classified=len(rows),
+                     inserted=stats.inserted, skipped_duplicates=stats.skipped_duplicates,
+                     skipped_invalid=len(df) - len(rows))
+            db.commit()
+            db.refresh(job)
+            analytics_cache.bump(job.user_id)
+
+
+def run_job(job_id: int):
+    with SessionLocal() as db:
+        if not claim(db, job_id):
+            return
+        job = db.get(J, job_id)
+        spool_path = job.spool_path
+        try:
+            process(db, job)
+        except LostClaim:
+            db.rollback()
+            logger.warning("Import job %s was taken over by another worker", job_id)
+            return
+        except Exception as e:
+            db.rollback()
+            logger.exception("Import job %s failed", job_id)
+            db.execute(update(J).where(J.id == job_id, J.worker == WORKER_ID)
+                       .values(status=FAILED, error=str(e)[:1000], finished_at=_now()))
+            db.commit()
+            return
+        db.execute(update(J).where(J.id == job_id, J.worker == WORKER_ID)
+                   .values(status=DONE, error=None, finished_at=_now()))
+        db.commit()
+    try:
+        os.remove(spool_path)
+    except OSError:
+        pass
+
+
+def retry(db, job) -> bool:
+    """Requeue a failed job; it resumes after its last committed batch."""
+    if job.status != FAILED or not os.path.exists(job.spool_path):
+        return False
+    job.status, job.error, job.finished_at = QUEUED, None, None
+    db.commit()
+    submit(job.id)
+    return True
+
+
+# --- Status ---
+def status(job) -> dict:
+    end = job.finished_at or _now()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "statement_format": job.statement_format,
+        "rows_read": job.rows_read,
+        "rows_classified": job.rows_classified,
+        "inserted": job.inserted,
+        "skipped": job.skipped_duplicates + job.skipped_invalid,
+        "skipped_duplicates": job.skipped_duplicates,
+        "skipped_invalid": job.skipped_invalid,
+        "elapsed_seconds": round(elapsed, 2),
+        "rows_per_second": round(job.rows_read / elapsed, 1) if elapsed > 0 else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
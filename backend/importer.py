@@ -0,0 +1,206 @@
+# importer.py
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import func, insert, select
+
+import category_catalog
+import models
+import rollups
+import statement_formats
+from classifier_utils import classify_batch, rules_for_user
+from instrumentation import span
+from lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 5000
+
+class ImportStats:
+    """Row counters and per-stage wall-clock timings for one import."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        self.skipped_duplicates = 0
+        self.skipped_invalid = 0
+        self.statement_format = None
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            with span(f"import.{name}"):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            "rows_read": self.rows_read,
+            "inserted": self.inserted,
+            "skipped": self.skipped_duplicates + self.skipped_invalid,
+            "skipped_duplicates": self.skipped_duplicates,
+            "skipped_invalid": self.skipped_invalid,
+            "statement_format": self.statement_format,
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+        }
+
+
+# --- Parsing ---
+def read_statement(contents: str, fmt: statement_formats.StatementFormat = None):
+    """(format, statement body); the format is sniffed unless given."""
+    return statement_formats.read_text(contents, fmt)
+
+
+def iter_statement_chunks(binary_file, batch_size: int = DEFAULT_BATCH_SIZE,
+                          fmt: statement_formats.StatementFormat = None):
+    """(format, generator of body DataFrames of at most batch_size rows).
+
+    Reads the file incrementally: the preamble is skipped line by line until
+    the header is found, and only the mapped columns of one batch are ever
+    held in memory.
+    """
+    return statement_formats.iter_chunks(binary_file, batch_size, fmt)
+
+
+def normalize_rows(df: pd.DataFrame, fmt: statement_formats.StatementFormat) -> pd.DataFrame:
+    """Vectorized per-row checks: returns description, date, amount, type_."""
+    desc = df["description"].astype("string").str.strip()
+    dates = fmt.dates(df)
+    amount, is_income = fmt.amounts(df)
+
+    valid = desc.notna() & (desc != "") & dates.notna() & amount.notna()
+    out = pd.DataFrame({
+        "description": desc[valid].astype(str),
+        "date": dates[valid].dt.date,
+        "amount": amount[valid].astype(float),
+        "type_": is_income[valid].map({True: "Income", False: "Expense"}),
+    })
+    return out.reset_index(drop=True)
+
+
+# --- Classification ---
+def classify_rows(rows: pd.DataFrame, rules=None, workers: int = None,
+                  catalog: category_catalog.Catalog = None) -> pd.DataFrame:
+    """Merchant name and category per row; with a catalog, categories the
+    user does not have become category_catalog.FALLBACK."""
+    labels = classify_batch(rows["description"], rules, workers)
+    rows["name"] = [merchant[:100] for merchant, _ in labels]
+    if catalog is None:
+        rows["category"] = [category for _, category in labels]
+    else:
+        rows["category"] = [catalog.validate(category) for _, category in labels]
+    return rows
+
+
+# --- Dedup ---
+def dedup_key(name, amount, date_val, type_):
+    return (name, round(float(amount), 2), str(date_val)[:10], type_)
+
+
+def existing_keys_query(user_id: int, start, end, max_id=None):
+    T = models.Transaction
+    stmt = select(T.name, T.amount, T.date, T.type_).where(
+        T.user_id == user_id,
+        T.date >= start,
+        T.date <= end,
+    )
+    if max_id is not None:
+        stmt = stmt.where(T.id <= max_id)
+    return stmt
+
+
+def existing_keys(db, user_id: int, start, end, max_id=None) -> set:
+    """Keys of the user's stored transactions in [start, end], fetched in one query."""
+    return {dedup_key(*r) for r in db.execute(existing_keys_query(user_id, start, end, max_id))}
+
+
+def drop_duplicates(rows: pd.DataFrame, known: set):
+    keys = [dedup_key(*k) for k in zip(rows["name"], rows["amount"], rows["date"], rows["type_"])]
+    mask = [k not in known for k in keys]
+    return rows[mask]
+
+
+# --- Insert ---
+def bulk_insert(db, rows: pd.DataFrame, user_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    records = [
+        {"name": name, "amount": amount, "category": category,
+         "date": date_val, "type_": type_, "user_id": user_id}
+        for name, amount, category, date_val, type_ in zip(
+            rows["name"], rows["amount"], rows["category"], rows["date"], rows["type_"])
+    ]
+    delta = rollups.RollupDelta()
+    for i in range(0, len(records), chunk_size):
+        db.execute(insert(models.Transaction), records[i:i + chunk_size])
+    for r in records:
+        delta.add(user_id, r["date"], r["category"], r["type_"], r["amount"])
+    rollups.apply(db, delta)
+    return len(records)
+
+
+def import_rows(db, rows: pd.DataFrame, user_id: int, stats: ImportStats,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, max_id=None, workers: int = None):
+    """Classify, dedup and insert already-normalized rows. Does not commit."""
+    if rows.empty:
+        return
+    with stats.stage("classify"):
+        rows = classify_rows(rows, rules_for_user(db, user_id), workers, category_catalog.for_user(db, user_id))
+    with stats.stage("dedup"):
+        known = existing_keys(db, user_id, rows["date"].min(), rows["date"].max(), max_id)
+        new_rows = drop_duplicates(rows, known)
+        stats.skipped_duplicates += len(rows) - len(new_rows)
+    with stats.stage("insert"):
+        stats.inserted += bulk_insert(db, new_rows, user_id, chunk_size)
+
+
+def max_transaction_id(db, user_id: int):
+    T = models.Transaction
+    return db.scalar(select(func.max(T.id)).where(T.user_id == user_id))
+
+
+def import_statement(db, contents: str, user_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     workers: int = None, fmt: statement_formats.StatementFormat = None) -> ImportStats:
+    stats = ImportStats()
+    with stats.stage("parse"):
+        fmt, df = read_statement(contents, fmt)
+        stats.statement_format = fmt.name
+        rows = normalize_rows(df, fmt)
+        stats.rows_read = len(df)
+        stats.skipped_invalid = len(df) - len(rows)
+    import_rows(db, rows, user_id, stats, chunk_size, workers=workers)
+    with stats.stage("commit"):
+        db.commit()
+    return stats
+
+
+def import_statement_stream(db, binary_file, user_id: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = None,
+                            fmt: statement_formats.StatementFormat = None) -> ImportStats:
+    """Constant-memory variant of import_statement.
+
+    Duplicates are only checked against rows that existed before the import
+    started (ids up to the current max), so earlier batches of the same file
+    never mask later ones -- the result matches import_statement exactly.
+    """
+    stats = ImportStats()
+    max_id = max_transaction_id(db, user_id)
+    fmt, chunks = iter_statement_chunks(binary_file, batch_size, fmt)
+    stats.statement_format = fmt.name
+    while True:
+        with stats.stage("parse"):
+            df = next(chunks, None)
+            if df is None:
+                break
+            rows = normalize_rows(df, fmt)
+            stats.rows_read += len(df)
+            stats.skipped_invalid += len(df) - len(rows)
+        import_rows(db, rows, user_id, stats, chunk_size, max_id if max_id is not None else 0, workers)
+    with stats.stage("commit"):
+        db.commit()
+    return stats
@@ -0,0 +1,340 @@
+# instrumentation.py
+"""Request latency, SQL and span metrics, plus an opt-in sampling profiler.
+
+InstrumentationMiddleware times every request (until the last body chunk
+is sent) into a histogram per route template, and counts the SQL statements
+the request ran. SQL is seen through cursor events on every engine passed
+to instrument_engine(); statements are attributed to the request through a
+context variable, which Starlette's thread pool and SQLAlchemy's async
+greenlets both carry over. span(name) times a block of code the same way.
+Each response gets a Server-Timing header with the totals up to its headers
+(a streamed body's queries only reach the histograms), and a
+request running more than SQL_WARN_STATEMENTS statements is logged -- the
+usual sign of a query per row.
+
+render() writes everything in the Prometheus text format.
+
+With PROFILING_ENABLED=1 a request carrying "X-Profile: 1" is sampled every
+PROFILE_INTERVAL_MS by a background thread; the response's X-Profile-Id
+names the collapsed stacks (flamegraph.pl / speedscope input) kept for the
+last PROFILE_KEEP profiles.
+"""
+
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SQL_WARN_STATEMENTS = int(os.getenv("SQL_WARN_STATEMENTS", "50"))
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "32"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+# --- Metric types ---
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1  # first bound >= value, or +Inf
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for values, counts in sorted(series.items()):
+            labels = _labels(self.labels, values)
+            running = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                running += n
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le=bound)} {running}")
+            lines.append(f"{self.name}_sum{labels} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {running}")
+        return lines
+
+
+class CounterFamily:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._lock = threading.Lock()
+        self._values = Counter()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, le=None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by route template.",
+                            ("method", "route"))
+REQUESTS = CounterFamily("http_requests_total", "Requests by route template and status.",
+                         ("method", "route", "status"))
+REQUEST_SQL = Histogram("http_request_sql_statements", "SQL statements run per request.",
+                        ("method", "route"), COUNT_BUCKETS)
+SQL_SECONDS = Histogram("sql_statement_duration_seconds", "SQL statement execution time.",
+                        buckets=SQL_BUCKETS)
+SPAN_SECONDS = Histogram("span_duration_seconds", "Time spent in instrumented code.", ("span",))
+METRICS = [REQUEST_SECONDS, REQUESTS, REQUEST_SQL, SQL_SECONDS, SPAN_SECONDS]
+
+
+def reset():
+    for metric in METRICS:
+        metric.clear()
+
+
+# --- Per-request totals ---
+class RequestStats:
+    __slots__ = ("sql_count", "sql_seconds", "spans")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.spans = {}
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"app;dur={total * 1000:.1f}",
+                 f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} statements"']
+        parts += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current() -> RequestStats | None:
+    return _current.get()
+
+
+def _record_span(name: str, elapsed: float):
+    SPAN_SECONDS.observe(elapsed, name)
+    stats = _current.get()
+    if stats is not None:
+        stats.spans[name] = stats.spans.get(name, 0.0) + elapsed
+
+
+class span:
+    """Times a block (`with span("x"):`) or every call of a function
+    (`@span("x")`). A class rather than @contextmanager: this wraps
+    per-row calls, where a generator per call costs more than the call."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record_span(self.name, time.perf_counter() - self.start)
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record_span(name, time.perf_counter() - start)
+        return timed
+
+
+# --- SQL ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    SQL_SECONDS.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+
+
+def instrument_engine(engine):
+    """Time every statement on a sync Engine (for async engines pass .sync_engine)."""
+    from sqlalchemy import event
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Sampling profiler ---
+# Leaf functions of a thread with nothing to do (thread pool, event loop, timers)
+IDLE_FRAMES = {"wait", "select", "_wait_for_tstate_lock", "sleep"}
+
+PROFILES = LRUCache(PROFILE_KEEP)
+_profiling = threading.Lock()  # one sampled request at a time
+
+
+def _folded(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Collects the stacks of every busy thread until stop() is called."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self.ticks = 0
+        self._done = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            self.ticks += 1
+            for ident, frame in sys._current_frames().items():
+                if ident != me and frame.f_code.co_name not in IDLE_FRAMES:
+                    self.samples[_folded(frame)] += 1
+
+    def stop(self) -> str:
+        self._done.set()
+        self.join()
+        header = f"# {self.ticks} ticks every {self.interval * 1000:g} ms\n"
+        return header + "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+
+# --- ASGI middleware ---
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        sampler = profile_id = None
+        if PROFILING_ENABLED and _wants_profile(scope) and _profiling.acquire(blocking=False):
+            sampler, profile_id = Sampler(), uuid.uuid4().hex
+            sampler.start()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                timing = stats.server_timing(time.perf_counter() - start)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                if profile_id:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            if sampler is not None:
+                PROFILES.put(profile_id, sampler.stop())
+                _profiling.release()
+            method, route = scope["method"], _route(scope)
+            REQUEST_SECONDS.observe(elapsed, method, route)
+            REQUESTS.inc(method, route, status_code)
+            REQUEST_SQL.observe(stats.sql_count, method, route)
+            if stats.sql_count > SQL_WARN_STATEMENTS:
+                logger.warning("%s %s ran %d SQL statements (%.1f ms)", method, route,
+                               stats.sql_count, stats.sql_seconds * 1000)
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value not in (b"", b"0")
+    return False
+
+
+def profile(profile_id: str) -> str | None:
+    return PROFILES.get(profile_id)
+
+
+# --- Exposition ---
+def _gauges(prefix: str, values: dict) -> list:
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value:g}")
+    return lines
+
+
+def render(gauges: dict = None) -> str:
+    """Prometheus text format; `gauges` maps a prefix to a stats dict whose
+    numeric fields are exported as <prefix>_<field>."""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for prefix, values in (gauges or {}).items():
+        lines += _gauges(prefix, values)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+# lazy_imports.py
+"""Deferred imports of heavy libraries.
+
+numpy and pandas take a third of a second to import, and most requests
+never touch them. Modules on the app's import path bind them with
+lazy_import(), which returns a stand-in at once and runs the real import
+on first attribute access. Annotations naming them must not be
+evaluated at definition time (from __future__ import annotations).
+
+HEAVY_IMPORTS picks when the cost is paid:
+
+    lazy        by the first request that needs the library (default)
+    background  by a thread started once the app is up (see main.lifespan)
+    eager       at import, as a plain import would
+"""
+
+import importlib
+import importlib.util
+import os
+
+MODE = os.getenv("HEAVY_IMPORTS", "lazy")
+
+_deferred = []
+
+
+class LazyModule:
+    """Stands in for a module until an attribute is read.
+
+    Not importlib.util.LazyLoader: before 3.12 a second thread can see its
+    module half initialized. import_module() holds the regular per-module
+    import lock, so concurrent first uses (or the background warm-up) wait
+    for one import. The module's namespace is then copied here, so later
+    lookups never reach __getattr__.
+    """
+
+    def __init__(self, name: str):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._lazy_name)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._lazy_name!r}>"
+
+
+def lazy_import(name: str):
+    if MODE == "eager":
+        return importlib.import_module(name)
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    if name not in _deferred:
+        _deferred.append(name)
+    return LazyModule(name)
+
+
+def load_all():
+    """Finish every deferred import."""
+    for name in _deferred:
+        importlib.import_module(name)
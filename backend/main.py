@@ -1,387 +1,404 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, File, UploadFile, Query, status
+import time
+_import_started = time.perf_counter()
+
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, File, UploadFile, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from database import SessionLocal, engine
-import models, schemas, crud
+from sqlalchemy.ext.asyncio import AsyncSession
+import database
+from database import SessionLocal, AsyncSessionLocal, engine, get_db, get_async_db
+import models, schemas, crud, crud_async, category_catalog, merchant_rules, instrumentation, lazy_imports, startup, user_cache, analytics_cache, forecasting, importer, import_jobs, statement_formats, classifier_utils, model_registry, online_learning, analytics
 from datetime import date
-from collections import defaultdict
-import numpy as np
-import pandas as pd
-import joblib, io, os
-from classifier_utils import classify_transaction_simple 
 from schemas import UserCreate, UserLogin, UserOut
 from crud import create_user, get_user_by_mobile
 
 
+# --- Startup (schema, seed and job recovery run here, not at import) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup.INIT_DB_ON_STARTUP:
+        with startup.phase("init_db"):
+            startup.init_db()
+    with startup.phase("backfill_rollups"):
+        startup.backfill_rollups()
+    # Pick up background imports interrupted by the last shutdown
+    with startup.phase("resume_jobs"):
+        import_jobs.resume_pending()
+    if lazy_imports.MODE == "background":
+        threading.Thread(target=lazy_imports.load_all, name="heavy-imports", daemon=True).start()
+    startup.log_ready()
+    yield
+    classifier_utils.shutdown_pool()
+
 # --- FastAPI setup ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Server-Timing", "X-Profile-Id"],
 )
-
-# --- Create tables ---
-models.Base.metadata.create_all(bind=engine)
-
-# --- DB dependency ---
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Outermost, so latency includes the other middleware
+app.add_middleware(instrumentation.InstrumentationMiddleware)
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(database.async_engine.sync_engine)
+
+# --- User dependency ---
+async def valid_user_id(user_id: int = Query(...)) -> int:
+    """404 unless the user exists. Known ids are answered from user_cache,
+    so the users table is only read the first time an id is seen."""
+    if user_cache.known(user_id):
+        return user_id
+    async with AsyncSessionLocal() as db:
+        user = await crud_async.get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_cache.remember(user_id)
+    return user_id
 
 # --- Auth endpoints ---
 @app.post("/signup", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_mobile(db, user.mobile)
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await crud_async.get_user_by_mobile(db, user.mobile)
     if existing:
         raise HTTPException(status_code=400, detail="Mobile number already registered.")
-    return crud.create_user(db, user)
+    db_user = await crud_async.create_user(db, user)
+    user_cache.remember(db_user.id)
+    return db_user
 
 @app.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    existing = get_user_by_mobile(db, user.mobile)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    existing = await crud_async.get_user_by_mobile(db, user.mobile)
     if not existing or existing.password != user.password:
         raise HTTPException(status_code=401, detail="Invalid credentials.")
     return {"user_id": existing.id, "name": existing.name}
 
-# --- Initialize default categories ---
-def init_default_categories():
-    with SessionLocal() as db:
-        defaults = [
-            {"name": "Food", "icon": "🍽️"},
-            {"name": "Transport", "icon": "🚌"},
-            {"name": "Shopping", "icon": "🛍️"},
-            {"name": "Entertainment", "icon": "🎬"},
-            {"name": "Bills", "icon": "💡"},
-            {"name": "Salary", "icon": "💰"},
-            {"name": "Gift", "icon": "🎁"},
-            {"name": "Transfer", "icon": "🔄"},
-            {"name": "Uncategorised", "icon": "❓"},
-            {"name": "Medical", "icon": "🏥"},
-            {"name": "Education", "icon": "📚"},
-            {"name": "Recharge", "icon": "📲"},
-            {"name": "Investment", "icon": "📈"},
-            {"name": "Loan", "icon": "💸"},
-            {"name": "Travel", "icon": "✈️"},
-            {"name": "Fuel", "icon": "⛽"},
-            {"name": "Groceries", "icon": "🛒"},
-            {"name": "Healthcare", "icon": "🩺"},
-            {"name": "Insurance", "icon": "📑"},
-        ]
-
-        for cat in defaults:
-            # Check if default category already exists (user_id is None for defaults)
-            if not db.query(models.Category).filter_by(name=cat["name"], user_id=None).first():
-                db.add(models.Category(**cat, user_id=None))  # Default categories have user_id=None
-        db.commit()
-
-# Initialize default categories on startup
-init_default_categories()
-
 # --- CSV Upload ---
 @app.post("/upload_csv/")
-def upload_csv(file: UploadFile = File(...), user_id: int = Query(...), db: Session = Depends(get_db)):
+def upload_csv(file: UploadFile = File(...), user_id: int = Depends(valid_user_id),
+               chunk_size: int = Query(importer.DEFAULT_CHUNK_SIZE, gt=0, le=10000),
+               stream: bool = Query(False),
+               batch_size: int = Query(importer.DEFAULT_BATCH_SIZE, gt=0, le=100000),
+               background: bool = Query(False),
+               workers: int = Query(None, gt=0, le=classifier_utils.MAX_WORKERS),
+               statement_format: str = Query(None),
+               db: Session = Depends(get_db)):
     try:
-        # Verify user exists
-        user = db.query(models.User).filter(models.User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        contents = file.file.read().decode("utf-8")
-        lines = contents.splitlines()
-        header_index = next((i for i, l in enumerate(lines) if "Txn Date" in l and "Description" in l), None)
-        if header_index is None:
-            raise HTTPException(400, "Header line not found")
-
-        df = pd.read_csv(io.StringIO("\n".join(lines[header_index:])))
-        df.columns = [c.strip() for c in df.columns]
-        df.rename(columns={"Txn Date": "date", "Description": "description",
-                           "Credit Amount": "Income", "Debit Amount": "Expense"}, inplace=True)
-        df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce").dt.date
-        
-        count = 0
-        for _, row in df.iterrows():
-            desc = str(row.get("description", "")).strip()
-            date_val = row.get("date")
-            inc, exp = row.get("Income"), row.get("Expense")
-            if pd.isna(inc) and pd.isna(exp): continue
-            if not desc or pd.isna(date_val): continue
-            amount, type_ = (str(inc), "Income") if not pd.isna(inc) else (str(exp), "Expense")
-            merchant, category = classify_transaction_simple(desc)
-            name = merchant[:100]
-            # Check if transaction already exists
-            exists = db.query(models.Transaction).filter_by(
-                name=name,
-                amount=float(amount),
-                date=date_val,
-                type_=type_,
-                user_id=user_id
-            ).first()
-
-            if exists:
-                continue  # Skip duplicates
-
-            # Add new transaction
-            db.add(models.Transaction(
-                name=name, 
-                amount=float(amount), 
-                category=category, 
-                date=date_val, 
-                type_=type_,
-                user_id=user_id
-            ))
-            count += 1
-
-
-        db.commit()
-        return {"message": f"{count} transactions imported successfully"}
-
+        fmt = statement_formats.get(statement_format) if statement_format else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if background:
+        job = import_jobs.create_job(db, user_id, file.file, file.filename, batch_size=batch_size,
+                                     chunk_size=chunk_size, statement_format=statement_format)
+        return JSONResponse({"job_id": job.id, "status": job.status, "message": "Import queued"},
+                            status_code=status.HTTP_202_ACCEPTED)
+    try:
+        if stream:
+            stats = importer.import_statement_stream(db, file.file, user_id, batch_size=batch_size,
+                                                     chunk_size=chunk_size, workers=workers, fmt=fmt)
+        else:
+            contents = file.file.read().decode("utf-8")
+            stats = importer.import_statement(db, contents, user_id, chunk_size=chunk_size,
+                                              workers=workers, fmt=fmt)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         raise HTTPException(500, f"Error processing CSV: {e}")
+    else:
+        # Both paths commit once at the end; a failed upload is rolled back and changes nothing
+        analytics_cache.bump(user_id)
+
+    return {"message": f"{stats.inserted} transactions imported successfully", **stats.as_dict()}
+
+@app.get("/statement_formats/")
+def list_statement_formats():
+    return [fmt.as_dict() for fmt in statement_formats.FORMATS.values()]
+
+# --- Import jobs ---
+def _user_job(db: Session, job_id: int, user_id: int):
+    job = db.get(models.ImportJob, job_id)
+    if not job or job.user_id != user_id:
+        raise HTTPException(404, "Import job not found")
+    return job
+
+@app.get("/import_jobs/")
+def list_import_jobs(user_id: int = Depends(valid_user_id), limit: int = Query(20, gt=0, le=100),
+                     db: Session = Depends(get_db)):
+    jobs = (db.query(models.ImportJob).filter_by(user_id=user_id)
+            .order_by(models.ImportJob.id.desc()).limit(limit))
+    return [import_jobs.status(job) for job in jobs]
+
+@app.get("/import_jobs/{job_id}")
+def get_import_job(job_id: int, user_id: int = Depends(valid_user_id), db: Session = Depends(get_db)):
+    return import_jobs.status(_user_job(db, job_id, user_id))
+
+@app.post("/import_jobs/{job_id}/retry")
+def retry_import_job(job_id: int, user_id: int = Depends(valid_user_id), db: Session = Depends(get_db)):
+    job = _user_job(db, job_id, user_id)
+    if not import_jobs.retry(db, job):
+        raise HTTPException(409, "Only failed jobs whose upload is still spooled can be retried")
+    return import_jobs.status(job)
 
 # --- Transactions CRUD ---
 @app.post("/transactions/", response_model=schemas.Transaction)
-def create_transaction(txn: schemas.TransactionCreate, user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return crud.create_transaction(db, txn, user_id)
+async def create_transaction(txn: schemas.TransactionCreate, user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.create_transaction(db, txn, user_id)
+
+@app.post("/transactions/batch", response_model=schemas.TransactionBatchResult)
+async def batch_transactions(batch: schemas.TransactionBatch, response: Response,
+                             user_id: int = Depends(valid_user_id), atomic: bool = Query(False),
+                             db: AsyncSession = Depends(get_async_db)):
+    """Create, update (changed fields only) and delete many transactions in
+    one DB transaction; results are per operation, in request order. With
+    atomic=true nothing is written if any operation fails (409). At most
+    TRANSACTION_BATCH_MAX operations (422 otherwise)."""
+    result = await crud_async.apply_transaction_batch(db, batch.operations, user_id, atomic)
+    if atomic and result["failed"]:
+        response.status_code = 409
+    return result
 
 @app.get("/transactions/", response_model=list[schemas.Transaction])
-def read_transactions(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return crud.get_transactions(db, user_id)
+async def read_transactions(response: Response, user_id: int = Depends(valid_user_id),
+                            limit: int = Query(None, gt=0, le=crud.MAX_PAGE_SIZE),
+                            cursor: str = Query(None),
+                            start_date: date = Query(None),
+                            end_date: date = Query(None),
+                            type_: str = Query(None),
+                            category: str = Query(None),
+                            format: str = Query("json", pattern="^(json|ndjson)$"),
+                            db: AsyncSession = Depends(get_async_db)):
+    """Newest first. With `limit`, returns one page and sets X-Next-Cursor
+    while more rows remain; pass it back as `cursor`. Without `limit` every
+    row is streamed (JSON array, or one object per line with format=ndjson)."""
+    try:
+        after = crud.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    filters = {"start_date": start_date, "end_date": end_date, "type_": type_, "category": category}
+
+    if limit:
+        rows = await crud_async.get_transactions(db, user_id, limit + 1, after, **filters)
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = crud.encode_cursor(rows[-1])
+        if format == "ndjson":
+            return StreamingResponse(_ndjson(_aiter(rows)), media_type=NDJSON, headers=headers)
+        response.headers.update(headers)
+        return rows
+
+    rows = crud_async.stream_transactions(user_id, after, **filters)
+    if format == "ndjson":
+        return StreamingResponse(_ndjson(rows), media_type=NDJSON)
+    return StreamingResponse(_json_array(rows), media_type="application/json")
+
+NDJSON = "application/x-ndjson"
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+async def _ndjson(rows):
+    async for txn in rows:
+        yield schemas.Transaction.model_validate(txn).model_dump_json() + "\n"
+
+async def _json_array(rows):
+    # Same body as the response_model path, built one row at a time
+    sep = "["
+    async for txn in rows:
+        yield sep + schemas.Transaction.model_validate(txn).model_dump_json()
+        sep = ","
+    yield "[]" if sep == "[" else "]"
 
 @app.delete("/transactions/{txn_id}")
-def delete_transaction(txn_id: int, user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    crud.delete_transaction(db, txn_id, user_id)
+async def delete_transaction(txn_id: int, user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    await crud_async.delete_transaction(db, txn_id, user_id)
     return {"message": "Deleted"}
 
 @app.put("/transactions/{txn_id}", response_model=schemas.Transaction)
-def update_transaction(txn_id: int, txn: schemas.TransactionCreate, user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return crud.update_transaction(db, txn_id, txn, user_id)
+async def update_transaction(txn_id: int, txn: schemas.TransactionCreate, user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.update_transaction(db, txn_id, txn, user_id)
 
 # --- Categories CRUD ---
 @app.get("/categories/", response_model=list[schemas.Category])
-def read_categories(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return crud.get_categories(db, user_id)
+async def read_categories(user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_categories(db, user_id)
 
 @app.post("/categories/", response_model=schemas.Category)
-def create_category(cat: schemas.CategoryCreate, user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return crud.create_category(db, cat, user_id)
-
-# --- Analytics endpoints ---
+async def create_category(cat: schemas.CategoryCreate, user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.create_category(db, cat, user_id)
+
+# --- Merchant rules ---
+@app.get("/merchant_rules/", response_model=list[schemas.MerchantRule])
+async def read_merchant_rules(user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_merchant_rules(db, user_id)
+
+@app.post("/merchant_rules/", response_model=schemas.MerchantRule)
+async def create_merchant_rule(rule: schemas.MerchantRuleCreate, user_id: int = Depends(valid_user_id), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.create_merchant_rule(db, rule, user_id)
+
+@app.get("/classifier/model")
+def classifier_model():
+    bundle = model_registry.registry.current()
+    if not bundle:
+        return {"version": None}
+    return {"version": bundle.version, "meta": bundle.meta, "available": model_registry.registry.versions()}
+
+@app.get("/classifier/online_learning")
+def classifier_online_learning():
+    return {"enabled": online_learning.ENABLED, "pending": online_learning.trainer.pending(),
+            **online_learning.trainer.stats}
+
+@app.get("/metrics/classifier_cache")
+def classifier_cache_metrics():
+    return classifier_utils.cache_stats()
+
+@app.get("/metrics/user_cache")
+def user_cache_metrics():
+    return user_cache.stats()
+
+@app.get("/metrics/analytics_cache")
+def analytics_cache_metrics():
+    return analytics_cache.stats()
+
+@app.get("/metrics/category_cache")
+def category_cache_metrics():
+    return category_catalog.stats()
+
+@app.get("/metrics/pool")
+def pool_metrics():
+    return {"sync": database.pool_status(database.engine),
+            "async": database.pool_status(database.async_engine.sync_engine)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return instrumentation.render({
+        "db_pool_sync": database.pool_status(database.engine),
+        "db_pool_async": database.pool_status(database.async_engine.sync_engine),
+        "classifier_cache": classifier_utils.cache_stats(),
+        "user_cache": user_cache.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "category_cache": category_catalog.stats(),
+        "merchant_rules_cache": merchant_rules.stats(),
+        "startup_seconds": startup.TIMINGS,
+    })
+
+@app.get("/metrics/profiles/{profile_id}", response_class=PlainTextResponse)
+def profile_result(profile_id: str):
+    """Collapsed stacks of a request sent with X-Profile (needs PROFILING_ENABLED=1)."""
+    folded = instrumentation.profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
+
+# --- Analytics response cache (see analytics_cache.py) ---
+async def cached_json(request: Request, endpoint: str, user_id: int, compute, **params):
+    """Serve compute()'s payload from analytics_cache, or 304 if the client's
+    ETag still matches the user's data version."""
+    key = analytics_cache.key(endpoint, user_id, params)
+    if key is None:
+        return JSONResponse(jsonable_encoder(await compute()), headers={"Cache-Control": "no-store"})
+    etag = analytics_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    body = analytics_cache.get(key)
+    if body is None:
+        body = JSONResponse(jsonable_encoder(await compute())).body
+        analytics_cache.put(key, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+# --- Analytics endpoints (served from daily_rollups, see rollups.py) ---
 @app.get("/analytics/all")
-def analytics_all(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    summary = db.execute(text("""
-        SELECT
-          SUM(CASE WHEN LOWER(TRIM(type_)) = 'income'  THEN amount ELSE 0 END) AS total_income,
-          SUM(CASE WHEN LOWER(TRIM(type_)) = 'expense' THEN amount ELSE 0 END) AS total_expense,
-          SUM(CASE WHEN LOWER(TRIM(type_)) = 'income'  THEN amount ELSE 0 END)
-            - SUM(CASE WHEN LOWER(TRIM(type_)) = 'expense' THEN amount ELSE 0 END) AS net_savings
-        FROM transactions WHERE user_id = :user_id;
-    """), {"user_id": user_id}).mappings().first()
-
-    year = db.execute(text("""
-        SELECT category, SUM(amount) as total, type_ FROM transactions
-        WHERE YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id 
-        GROUP BY category, type_ ORDER BY total DESC;
-    """), {"user_id": user_id}).mappings().all()
-
-    month = db.execute(text("""
-        SELECT category, SUM(amount) as total, type_ FROM transactions
-        WHERE MONTH(date) = MONTH(CURDATE()) AND YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id
-        GROUP BY category, type_ ORDER BY total DESC;
-    """), {"user_id": user_id}).mappings().all()
-
-    week = db.execute(text("""
-        SELECT category, SUM(amount) as total, type_ FROM transactions
-        WHERE WEEK(date, 1) = WEEK(CURDATE(), 1) AND YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id
-        GROUP BY category, type_ ORDER BY total DESC;
-    """), {"user_id": user_id}).mappings().all()
-
-    date = db.execute(text("""
-        SELECT category, SUM(amount) as total, type_ FROM transactions
-        WHERE date = CURDATE() AND user_id = :user_id 
-        GROUP BY category, type_ ORDER BY total DESC;
-    """), {"user_id": user_id}).mappings().all()
-
-    return {
-        "summary": summary,
-        "year": year,
-        "month": month,
-        "week": week,
-        "date": date,
-    }
+async def analytics_all(request: Request, user_id: int = Depends(valid_user_id),
+                        db: AsyncSession = Depends(get_async_db)):
+    async def compute():
+        return (await db.run_sync(analytics.dashboard, user_id))["all"]
+    return await cached_json(request, "all", user_id, compute)
 
 @app.get("/analytics/trends")
-def analytics_trends(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    def get(query): 
-        return db.execute(text(query), {"user_id": user_id}).mappings().all()
-    
-    return {
-        "day_trends": get("SELECT SUM(amount) AS total, type_ FROM transactions WHERE date = CURDATE() AND user_id = :user_id GROUP BY type_;"),
-        "week_trends": get("SELECT SUM(amount) AS total, type_ FROM transactions WHERE WEEK(date, 1) = WEEK(CURDATE(), 1) AND YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id GROUP BY type_;"),
-        "month_trends": get("SELECT SUM(amount) AS total, type_ FROM transactions WHERE MONTH(date) = MONTH(CURDATE()) AND YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id GROUP BY type_;"),
-        "year_trends": get("SELECT SUM(amount) AS total, type_ FROM transactions WHERE YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id GROUP BY type_;"),
-    }
+async def analytics_trends(request: Request, user_id: int = Depends(valid_user_id),
+                           db: AsyncSession = Depends(get_async_db)):
+    async def compute():
+        return (await db.run_sync(analytics.dashboard, user_id))["trends"]
+    return await cached_json(request, "trends", user_id, compute)
+
+@app.get("/analytics/dashboard")
+async def analytics_dashboard(request: Request, user_id: int = Depends(valid_user_id),
+                              db: AsyncSession = Depends(get_async_db)):
+    """/analytics/all and /analytics/trends in one response and one query."""
+    async def compute():
+        return await db.run_sync(analytics.dashboard, user_id)
+    return await cached_json(request, "dashboard", user_id, compute)
 
 @app.get("/analytics/filter")
-def filter_analysis(user_id: int = Query(...), db: Session = Depends(get_db),
-                    start_date: str = Query(None),
-                    end_date: str = Query(None),
-                    type_: str = Query(None),
-                    category: str = Query(None)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    base_query = """
-        SELECT category, SUM(amount) AS total, type_, date
-        FROM transactions WHERE user_id = :user_id
-    """
-    filters = []
-    params = {"user_id": user_id}
-    
-    if start_date: 
-        filters.append("AND date >= :start_date")
-        params["start_date"] = start_date
-    if end_date: 
-        filters.append("AND date <= :end_date")
-        params["end_date"] = end_date
-    if type_: 
-        filters.append("AND type_ = :type_")
-        params["type_"] = type_
-    if category: 
-        filters.append("AND category = :category")
-        params["category"] = category
-        
-    final_query = base_query + " " + " ".join(filters) + " GROUP BY category, type_, date ORDER BY date"
-    return db.execute(text(final_query), params).mappings().all()
+async def filter_analysis(request: Request, user_id: int = Depends(valid_user_id),
+                          db: AsyncSession = Depends(get_async_db),
+                          start_date: date = Query(None),
+                          end_date: date = Query(None),
+                          type_: str = Query(None),
+                          category: str = Query(None)):
+    async def compute():
+        return await db.run_sync(analytics.filtered, user_id, start_date, end_date, type_, category)
+    return await cached_json(request, "filter", user_id, compute, start_date=start_date,
+                             end_date=end_date, type_=type_, category=category)
 
 @app.get("/analytics/monthly_spending")
-def get_monthly_spending(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    result = db.execute(text("""
-        SELECT SUM(amount) AS total FROM transactions 
-        WHERE type_ = 'Expense' AND MONTH(date) = MONTH(CURDATE()) 
-        AND YEAR(date) = YEAR(CURDATE()) AND user_id = :user_id;
-    """), {"user_id": user_id}).mappings().first()
-    
-    return {"total_spent": result["total"] or 0}
+async def get_monthly_spending(request: Request, user_id: int = Depends(valid_user_id),
+                               db: AsyncSession = Depends(get_async_db)):
+    async def compute():
+        total = await db.run_sync(analytics.expense_total, user_id, *analytics.month_range(date.today()))
+        return {"total_spent": total or 0}
+    return await cached_json(request, "monthly_spending", user_id, compute)
 
 @app.get("/analytics/recommend_budget")
-def recommend_budget(user_id: int = Query(...), db: Session = Depends(get_db), 
-                    months: int = Query(6), target_saving: float = Query(2000.0)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
+async def recommend_budget(request: Request, user_id: int = Depends(valid_user_id),
+                           db: AsyncSession = Depends(get_async_db),
+                           months: int = Query(6), target_saving: float = Query(2000.0)):
     if months <= 0:
         raise HTTPException(400, detail="Months must be positive.")
-        
-    rows = db.execute(text(f"""
-        SELECT category, SUM(amount) AS total FROM transactions
-        WHERE user_id = :user_id AND type_ = 'Expense' 
-        AND date >= DATE_SUB(CURDATE(), INTERVAL {months} MONTH)
-        GROUP BY category;
-    """), {"user_id": user_id}).mappings().all()
-
-    category_totals = {r["category"]: r["total"] for r in rows}
-    total_spent = sum(category_totals.values())
-    
-    if total_spent == 0:
-        raise HTTPException(400, detail="No expense data found.")
-    if target_saving >= total_spent:
-        raise HTTPException(400, detail="Saving goal exceeds total expenses.")
-        
-    allocatable = total_spent - target_saving
-    recommendations = {
-        cat: round((val / total_spent) * allocatable, 2)
-        for cat, val in category_totals.items()
-    }
-
-    return {
-        "months_considered": months,
-        "total_spent": round(total_spent, 2),
-        "target_saving": target_saving,
-        "allocatable_budget": round(allocatable, 2),
-        "recommended_budget": recommendations
-    }
-
-from sklearn.linear_model import LinearRegression
+
+    async def compute():
+        category_totals = await db.run_sync(analytics.expense_by_category, user_id, analytics.months_ago(date.today(), months))
+        total_spent = sum(category_totals.values())
+
+        if total_spent == 0:
+            raise HTTPException(400, detail="No expense data found.")
+        if target_saving >= total_spent:
+            raise HTTPException(400, detail="Saving goal exceeds total expenses.")
+
+        allocatable = total_spent - target_saving
+        recommendations = {
+            cat: round((val / total_spent) * allocatable, 2)
+            for cat, val in category_totals.items()
+        }
+
+        return {
+            "months_considered": months,
+            "total_spent": round(total_spent, 2),
+            "target_saving": target_saving,
+            "allocatable_budget": round(allocatable, 2),
+            "recommended_budget": recommendations
+        }
+    return await cached_json(request, "recommend_budget", user_id, compute,
+                             months=months, target_saving=target_saving)
 
 @app.get("/analytics/predict_budget")
-def predict_next_month_budget(user_id: int = Query(...), db: Session = Depends(get_db)):
-    # Verify user exists
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    rows = db.execute(text("""
-        SELECT MONTH(date) AS month, YEAR(date) AS year, category, SUM(amount) AS total
-        FROM transactions
-        WHERE user_id = :user_id AND type_ = 'Expense' 
-        AND date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-        GROUP BY year, month, category ORDER BY year, month;
-    """), {"user_id": user_id}).mappings().all()
-
-    category_series = defaultdict(list)
-    for row in rows:
-        month_idx = (row['year'] - 2000) * 12 + row['month']
-        category_series[row['category']].append((month_idx, row['total']))
-
-    predictions = {}
-    for cat, data in category_series.items():
-        if len(data) >= 2:
-            data.sort()
-            X = np.array([[x[0]] for x in data])
-            y = np.array([x[1] for x in data])
-            model = LinearRegression().fit(X, y)
-            next_month = max(x[0] for x in data) + 1
-            pred = max(model.predict([[next_month]])[0], 0)
-            predictions[cat] = round(float(pred), 2)
-
-    return predictions
\ No newline at end of file
+async def predict_next_month_budget(request: Request, user_id: int = Depends(valid_user_id),
+                                    model: str = Query(forecasting.DEFAULT_MODEL),
+                                    db: AsyncSession = Depends(get_async_db)):
+    if model not in forecasting.MODELS:
+        raise HTTPException(400, detail=f"Unknown model. Choose from: {', '.join(sorted(forecasting.MODELS))}")
+
+    async def compute():
+        return await db.run_sync(forecasting.predict_user, user_id, model)
+    return await cached_json(request, "predict_budget", user_id, compute, model=model)
+
+startup.record("import_main", time.perf_counter() - _import_started)
@@ -0,0 +1,257 @@
+# merchant_rules.py
+
+import csv
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from cache_utils import LRUCache
+
+# Category-name rules rank below every merchant rule, wherever they were loaded from
+FALLBACK_PRIORITY = 10 ** 9
+
+RULES_PATH = os.getenv("MERCHANT_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "merchant_rules.csv"))
+# Rules stored through another worker are picked up within this many seconds
+RULES_TTL = float(os.getenv("MERCHANT_RULES_TTL", "60"))
+RULES_CACHE_SIZE = int(os.getenv("MERCHANT_RULES_CACHE_SIZE", "10000"))
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over upper-cased keywords.
+
+    Every keyword carries a priority (lower wins) and a payload. match() walks
+    the text once and returns the payload of the best keyword found anywhere
+    in it, so the cost is O(len(text)) no matter how many keywords are loaded.
+    Keywords can be added at any time; the automaton is rebuilt lazily on the
+    next match, into fresh lists published with one assignment, so a
+    concurrent match() walks either the old automaton or the new one.
+    """
+
+    def __init__(self):
+        # The trie as built by add(); only touched under the lock
+        self._goto = [{}]
+        self._own = [None]   # (priority, payload) of the keyword ending at this node
+        self._alphabet = set()
+        # What match() walks: (goto, fail, best, alphabet), best being the
+        # best of own along the failure chain
+        self._compiled = ([{}], [0], [None], frozenset())
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def add(self, keyword: str, payload, priority: int):
+        keyword = keyword.upper()
+        if not keyword:
+            return
+        with self._lock:
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._own.append(None)
+                    self._goto[node][ch] = nxt
+                node = nxt
+            if self._own[node] is None or priority < self._own[node][0]:
+                if self._own[node] is None:
+                    self.size += 1
+                self._own[node] = (priority, payload)
+            self._alphabet.update(keyword)
+            self._dirty = True
+
+    def _build(self):
+        goto = [dict(edges) for edges in self._goto]
+        own = list(self._own)
+        fail = [0] * len(goto)
+        best = [None] * len(goto)
+        best[0] = own[0]
+        queue = deque()
+        for child in goto[0].values():
+            fail[child] = 0
+            best[child] = own[child]
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != child else 0
+                candidates = [c for c in (own[child], best[fail[child]]) if c is not None]
+                best[child] = min(candidates, key=lambda c: c[0]) if candidates else None
+                queue.append(child)
+        self._compiled = (goto, fail, best, frozenset(self._alphabet))
+        self._dirty = False
+
+    def match(self, text: str):
+        """Return (priority, payload) of the best keyword contained in text, or None."""
+        if self._dirty:
+            with self._lock:
+                if self._dirty:
+                    self._build()
+        goto, fail, best, alphabet = self._compiled
+        node, found = 0, None
+        for ch in text:
+            if ch not in alphabet:
+                node = 0
+                continue
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = best[node]
+            if hit is not None and (found is None or hit[0] < found[0]):
+                found = hit
+        return found
+
+
+class RuleSet:
+    """Global merchant rules plus optional per-user overrides.
+
+    A rule maps a keyword to (merchant label, category). User rules always
+    beat global ones; within a set the rule added first wins, which mirrors
+    the old ordered scan over MERCHANT_TO_CAT and then CATEGORIES.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.matcher = KeywordMatcher()
+        self._rules = []
+        self._count = 0
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._digest = None  # of the rules in order; None while there are none
+
+    @property
+    def version(self):
+        """Derived from the rules (in order) of this set and its parents, so
+        equal rules give equal versions across reloads, processes and users;
+        a set with no rules of its own shares its parent's. Safe to use in
+        cache keys."""
+        parent = self.parent.version if self.parent else None
+        return parent if self._digest is None else (self._digest, parent)
+
+    def add(self, keyword: str, category: str, merchant: str = None, fallback: bool = False):
+        self._rules.append((keyword, category, merchant, fallback))
+        priority = self._count + (FALLBACK_PRIORITY if fallback else 0)
+        self.matcher.add(keyword, (merchant or keyword.title(), category), priority)
+        self._count += 1
+        self._hash.update(repr((keyword, category, merchant, fallback)).encode() + b"\n")
+        self._digest = self._hash.hexdigest()
+
+    def match(self, desc_upper: str):
+        hit = self.matcher.match(desc_upper) if self.matcher.size else None
+        if hit is not None:
+            return hit[1]
+        return self.parent.match(desc_upper) if self.parent else None
+
+    def copy(self):
+        """A new set with the same parent and rules, in the same order."""
+        ruleset = RuleSet(self.parent)
+        for rule in self._rules:
+            ruleset.add(*rule)
+        return ruleset
+
+
+# --- Loading ---
+def load_rules_file(ruleset: RuleSet, path: str = RULES_PATH):
+    """Add rules from a CSV with keyword,category[,merchant] columns."""
+    if not path or not os.path.exists(path):
+        return 0
+    n = 0
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            keyword = (row.get("keyword") or "").strip()
+            category = (row.get("category") or "").strip()
+            if keyword and category:
+                ruleset.add(keyword, category, (row.get("merchant") or "").strip() or None)
+                n += 1
+    return n
+
+
+def _db_rules(db, user_id) -> list:
+    import models
+    rows = db.query(models.MerchantRule).filter(
+        models.MerchantRule.user_id == user_id
+    ).order_by(models.MerchantRule.id).all()
+    return [(r.keyword, r.category, r.merchant) for r in rows]
+
+
+def load_rules_db(ruleset: RuleSet, db, user_id):
+    rules = _db_rules(db, user_id)
+    for rule in rules:
+        ruleset.add(*rule)
+    return len(rules)
+
+
+def build_global_rules(merchant_to_cat: dict, categories) -> RuleSet:
+    ruleset = RuleSet()
+    for kw, cat in merchant_to_cat.items():
+        ruleset.add(kw, cat)
+    for cat in categories:
+        ruleset.add(cat, cat, cat, fallback=True)
+    load_rules_file(ruleset)
+    return ruleset
+
+
+# --- Per-user cache ---
+# Both caches expire after RULES_TTL, so rules stored through another worker
+# (which only patches its own copy) are seen everywhere within that time.
+_lock = threading.Lock()
+_global = None  # (base RuleSet, base + global DB rules, expires at, the DB rules)
+_user_rules = LRUCache(maxsize=RULES_CACHE_SIZE, ttl=RULES_TTL)
+# Bumped by add_user_rule() and invalidate(); a load that started before the bump is not cached
+_generations = defaultdict(int)
+
+
+def global_rules(db, base: RuleSet) -> RuleSet:
+    """base plus the global (user_id NULL) DB rules, reloaded every RULES_TTL."""
+    global _global
+    entry = _global
+    if entry is None or entry[0] is not base or entry[2] <= time.monotonic():
+        rules = _db_rules(db, None)
+        if entry is not None and entry[0] is base and entry[3] == rules:
+            ruleset = entry[1]  # unchanged: keep its version, and the classifications cached under it
+        else:
+            # Added after base, so they rank below its merchant rules as before
+            ruleset = base.copy()
+            for rule in rules:
+                ruleset.add(*rule)
+        entry = _global = (base, ruleset, time.monotonic() + RULES_TTL, rules)
+    return entry[1]
+
+
+def rules_for_user(db, user_id: int, base: RuleSet) -> RuleSet:
+    """Return the cached RuleSet for a user, loading rules from the DB on a miss."""
+    parent = global_rules(db, base)
+    ruleset = _user_rules.get(user_id)
+    if ruleset is None:
+        generation = _generations.get(user_id, 0)
+        ruleset = RuleSet(parent=parent)
+        load_rules_db(ruleset, db, user_id)
+        with _lock:
+            if _generations.get(user_id, 0) == generation:
+                _user_rules.put(user_id, ruleset)
+    elif ruleset.parent is not parent:
+        ruleset.parent = parent  # global rules were reloaded (the version changes only if they did)
+    return ruleset
+
+
+def add_user_rule(user_id, keyword: str, category: str, merchant: str = None):
+    """Extend an already cached RuleSet in place after a rule was stored."""
+    with _lock:
+        _generations[user_id] += 1
+    ruleset = _user_rules.get(user_id)
+    if ruleset is not None:
+        ruleset.add(keyword, category, merchant)
+
+
+def invalidate(user_id: int):
+    with _lock:
+        _generations[user_id] += 1
+        _user_rules.pop(user_id)
+
+
+def stats() -> dict:
+    return _user_rules.stats()
@@ -0,0 +1,246 @@
+# migrate_native_types.py
+"""Move transactions.amount/date from VARCHAR to DECIMAL/DATE and add the
+composite indexes declared in models.py, without taking the table offline.
+
+    python migrate_native_types.py status
+    python migrate_native_types.py expand      # add shadow columns + sync triggers
+    python migrate_native_types.py backfill    # fill shadow columns in id batches
+    python migrate_native_types.py contract    # swap shadow columns in
+    python migrate_native_types.py indexes     # create missing indexes online
+    python migrate_native_types.py explain     # assert every analytics query uses an index
+    python migrate_native_types.py all
+
+Expand/backfill only apply to MySQL. SQLite (local development) cannot
+change a column's type in place, so there contract rebuilds the table in one
+transaction instead.
+"""
+
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import inspect, select, text
+
+import analytics
+import crud
+import importer
+import models
+from database import engine
+
+TABLE = "transactions"
+SHADOW = {"amount": ("amount_num", "DECIMAL(12,2)"), "date": ("date_val", "DATE")}
+TRIGGERS = ("trg_transactions_native_ins", "trg_transactions_native_upd")
+
+AMOUNT_EXPR = "CAST({src} AS DECIMAL(12,2))"
+DATE_EXPR = "CAST(LEFT({src}, 10) AS DATE)"
+
+
+def _is_mysql():
+    return engine.dialect.name == "mysql"
+
+
+def _columns() -> dict:
+    return {c["name"]: str(c["type"]).upper() for c in inspect(engine).get_columns(TABLE)}
+
+
+def status() -> dict:
+    cols = _columns()
+    indexes = {i["name"] for i in inspect(engine).get_indexes(TABLE)}
+    wanted = {i.name for i in models.Transaction.__table__.indexes}
+    return {
+        "dialect": engine.dialect.name,
+        "amount_type": cols.get("amount"),
+        "date_type": cols.get("date"),
+        "shadow_columns": [s for s, _ in SHADOW.values() if s in cols],
+        "missing_indexes": sorted(wanted - indexes),
+    }
+
+
+def _has_text_columns() -> bool:
+    cols = _columns()
+    return "CHAR" in cols.get("amount", "") or "CHAR" in cols.get("date", "")
+
+
+def _needs_conversion() -> bool:
+    return _is_mysql() and _has_text_columns()
+
+
+# --- Expand ---
+def expand():
+    if not _needs_conversion():
+        print("Nothing to expand")
+        return
+    cols = _columns()
+    with engine.begin() as conn:
+        adds = [f"ADD COLUMN {shadow} {sql_type} NULL"
+                for shadow, sql_type in SHADOW.values() if shadow not in cols]
+        if adds:
+            conn.execute(text(f"ALTER TABLE {TABLE} {', '.join(adds)}, ALGORITHM=INPLACE, LOCK=NONE"))
+        # Keep the shadow columns in sync for rows written while the backfill runs
+        assign = (f"SET NEW.amount_num = {AMOUNT_EXPR.format(src='NEW.amount')}, "
+                  f"NEW.date_val = {DATE_EXPR.format(src='NEW.date')}")
+        for name, event in zip(TRIGGERS, ("INSERT", "UPDATE")):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(f"CREATE TRIGGER {name} BEFORE {event} ON {TABLE} FOR EACH ROW {assign}"))
+    print("Added shadow columns and sync triggers")
+
+
+# --- Backfill ---
+def backfill(batch_size: int = 5000, pause: float = 0.05) -> int:
+    """Fill the shadow columns in short id-range transactions; safe to re-run."""
+    if not _needs_conversion():
+        print("Nothing to backfill")
+        return 0
+    update = text(f"""
+        UPDATE {TABLE}
+        SET amount_num = {AMOUNT_EXPR.format(src='amount')}, date_val = {DATE_EXPR.format(src='date')}
+        WHERE id >= :lo AND id < :hi AND (amount_num IS NULL OR date_val IS NULL)
+    """)
+    with engine.connect() as conn:
+        lo, hi = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {TABLE}")).one()
+    if lo is None:
+        return 0
+    done = 0
+    for start in range(lo, hi + 1, batch_size):
+        with engine.begin() as conn:
+            done += conn.execute(update, {"lo": start, "hi": start + batch_size}).rowcount
+        print(f"  ids < {min(start + batch_size, hi + 1)}: {done} rows converted", flush=True)
+        time.sleep(pause)
+    return done
+
+
+def _unconverted(conn) -> list:
+    return list(conn.execute(text(
+        f"SELECT id, amount, date FROM {TABLE} WHERE amount_num IS NULL OR date_val IS NULL LIMIT 20")))
+
+
+# --- Contract ---
+def _rebuild_sqlite():
+    table = models.Transaction.__table__
+    names = [c.name for c in table.columns]
+    source = {"amount": "CAST(amount AS NUMERIC)", "date": "substr(date, 1, 10)"}
+    with engine.begin() as conn:
+        for index in inspect(conn).get_indexes(TABLE):
+            conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+        conn.exec_driver_sql(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old")
+        table.create(bind=conn)
+        conn.exec_driver_sql(
+            f"INSERT INTO {TABLE} ({', '.join(names)}) "
+            f"SELECT {', '.join(source.get(n, n) for n in names)} FROM {TABLE}_old")
+        conn.exec_driver_sql(f"DROP TABLE {TABLE}_old")
+    print("Rebuilt transactions with NUMERIC/DATE columns")
+
+
+def contract():
+    if engine.dialect.name == "sqlite" and _has_text_columns():
+        _rebuild_sqlite()
+        return
+    if not _needs_conversion():
+        print("Nothing to contract")
+        return
+    with engine.begin() as conn:
+        for name in TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        # Catch rows written between the last backfill batch and the trigger drop
+        conn.execute(text(f"""
+            UPDATE {TABLE}
+            SET amount_num = {AMOUNT_EXPR.format(src='amount')}, date_val = {DATE_EXPR.format(src='date')}
+            WHERE amount_num IS NULL OR date_val IS NULL
+        """))
+        bad = _unconverted(conn)
+        if bad:
+            raise SystemExit(f"Rows with unparseable amount/date, fix them and re-run: {bad}")
+        # NOT NULL makes this fail (instead of losing data) if a write slipped in unconverted
+        conn.execute(text(f"""
+            ALTER TABLE {TABLE}
+              DROP COLUMN amount, CHANGE COLUMN amount_num amount DECIMAL(12,2) NOT NULL,
+              DROP COLUMN date, CHANGE COLUMN date_val date DATE NOT NULL,
+              ALGORITHM=INPLACE, LOCK=NONE
+        """))
+    print("Swapped in DECIMAL/DATE columns")
+
+
+# --- Indexes ---
+def create_indexes():
+    for table in (models.Transaction.__table__, models.DailyRollup.__table__):
+        table.create(bind=engine, checkfirst=True)
+        existing = {i["name"] for i in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if _is_mysql():
+                cols = ", ".join(c.name for c in index.columns)
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        f"CREATE INDEX {index.name} ON {table.name} ({cols}) ALGORITHM=INPLACE LOCK=NONE"))
+            else:
+                index.create(bind=engine)
+            print(f"Created index {index.name}")
+
+
+# --- EXPLAIN ---
+def explain_targets(user_id: int) -> dict:
+    today = date.today()
+    targets = analytics.explain_targets(user_id, today)
+    targets["import_dedup"] = importer.existing_keys_query(user_id, analytics.months_ago(today, 6), today, 10 ** 9)
+    targets["list_transactions"] = crud.transactions_query(user_id)
+    targets["list_transactions(page)"] = crud.transactions_query(user_id, after=(today, 10 ** 9)).limit(100)
+    return targets
+
+
+def _plan(conn, stmt) -> list:
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[k] for k in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    return [dict(r._mapping) for r in conn.exec_driver_sql(prefix + compiled.string, params)]
+
+
+def _uses_index(plan: list) -> bool:
+    if engine.dialect.name == "sqlite":
+        return all(not p["detail"].startswith("SCAN ") or "USING" in p["detail"]
+                   for p in plan if "TEMP B-TREE" not in p["detail"])
+    return all(p.get("key") for p in plan if p.get("table"))
+
+
+def explain(user_id: int = None) -> bool:
+    with engine.connect() as conn:
+        if user_id is None:
+            user_id = conn.scalar(select(models.User.id).limit(1)) or 1
+        ok = True
+        for name, stmt in explain_targets(user_id).items():
+            plan = _plan(conn, stmt)
+            good = _uses_index(plan)
+            ok &= good
+            print(f"{'ok  ' if good else 'FULL'} {name}")
+            for row in plan:
+                print("     ", row.get("detail") or {k: row.get(k) for k in ("table", "type", "key", "rows", "Extra")})
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert transactions to native column types")
+    parser.add_argument("command", choices=["status", "expand", "backfill", "contract", "indexes", "explain", "all"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between backfill batches")
+    parser.add_argument("--user-id", type=int, help="user whose queries are EXPLAINed")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(status())
+    if args.command in ("expand", "all"):
+        expand()
+    if args.command in ("backfill", "all"):
+        backfill(args.batch_size, args.pause)
+    if args.command in ("contract", "all"):
+        contract()
+    if args.command in ("indexes", "all"):
+        create_indexes()
+    if args.command in ("explain", "all"):
+        if not explain(args.user_id):
+            raise SystemExit("Some queries do not use an index")
+
+
+if __name__ == "__main__":
+    main()
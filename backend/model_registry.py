@@ -0,0 +1,184 @@
+# model_registry.py
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from instrumentation import span
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.getenv("MODEL_STORE_DIR", os.path.join(BASE_DIR, "model_store"))
+
+VECTORIZER_FILE = "tfidf_vectorizer.joblib"
+CLASSIFIER_FILE = "nb_classifier.joblib"
+CURRENT_FILE = "CURRENT"
+LEGACY_VERSION = "legacy"
+
+_VERSION_RE = re.compile(r"^v(\d+)$")
+
+
+class ModelBundle:
+    """One immutable (vectorizer, classifier) pair. Callers grab a bundle once
+    per request/batch so a concurrent swap never mixes two versions."""
+
+    def __init__(self, version: str, vectorizer, classifier, meta: dict = None):
+        self.version = version
+        self.vectorizer = vectorizer
+        self.classifier = classifier
+        self.meta = meta or {}
+        self.loaded_at = time.time()
+
+    @span("model.predict")
+    def predict(self, descs: list) -> list:
+        return list(self.classifier.predict(self.vectorizer.transform(descs)))
+
+
+class ModelRegistry:
+    """Versioned classifier artifacts on disk with lazy loading and atomic swaps.
+
+    Layout: <root>/v0001/{tfidf_vectorizer,nb_classifier}.joblib plus meta.json,
+    and <root>/CURRENT naming the active version. Without any published
+    version the artifacts next to this file are served as "legacy".
+
+    Artifacts are loaded with joblib mmap_mode so the numpy arrays inside the
+    estimators are backed by the page cache and shared between worker
+    processes. Every check_interval seconds current() re-reads CURRENT, so a
+    version published by train.py is picked up without a restart.
+    """
+
+    def __init__(self, root: str = STORE_DIR, legacy_dir: str = BASE_DIR,
+                 check_interval: float = 5.0, mmap_mode: str = "r"):
+        self.root = root
+        self.legacy_dir = legacy_dir
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._bundle = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    # --- Reading ---
+    def current(self):
+        """Return the active ModelBundle (None if no artifacts exist)."""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._bundle
+
+    def reload(self):
+        """Re-load the active version even if it is already loaded."""
+        self._refresh(force=True)
+        return self._bundle
+
+    def on_swap(self, callback):
+        """Register callback(bundle) to run after a new version is swapped in."""
+        self._listeners.append(callback)
+
+    def _refresh(self, force: bool = False):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            version = self._active_version()
+            if not force and self._bundle is not None and self._bundle.version == version:
+                return
+            bundle = self._load(version)
+            if bundle is None:
+                return  # keep serving what we have, if anything
+            self._bundle = bundle
+        for callback in self._listeners:
+            callback(bundle)
+
+    def _active_version(self) -> str:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                version = f.read().strip()
+            if version and os.path.isdir(os.path.join(self.root, version)):
+                return version
+        except FileNotFoundError:
+            pass
+        return LEGACY_VERSION
+
+    def _dir_for(self, version: str) -> str:
+        return self.legacy_dir if version == LEGACY_VERSION else os.path.join(self.root, version)
+
+    def _load(self, version: str):
+        import joblib
+        directory = self._dir_for(version)
+        vec_path = os.path.join(directory, VECTORIZER_FILE)
+        clf_path = os.path.join(directory, CLASSIFIER_FILE)
+        if not (os.path.exists(vec_path) and os.path.exists(clf_path)):
+            return None
+        meta = {}
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        return ModelBundle(
+            version,
+            joblib.load(vec_path, mmap_mode=self.mmap_mode),
+            joblib.load(clf_path, mmap_mode=self.mmap_mode),
+            meta,
+        )
+
+    # --- Writing ---
+    def versions(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        found = [d for d in os.listdir(self.root) if _VERSION_RE.match(d)]
+        return sorted(found, key=lambda d: int(_VERSION_RE.match(d).group(1)))
+
+    def publish(self, vectorizer, classifier, meta: dict = None, activate: bool = True) -> str:
+        """Write a new version directory and (by default) make it current.
+
+        The artifacts are written to a temp dir and renamed into place, then
+        CURRENT is replaced atomically, so readers never see a partial version.
+        """
+        import joblib
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".publish-", dir=self.root)
+        try:
+            # Uncompressed dumps so the arrays can be memory-mapped on load
+            joblib.dump(vectorizer, os.path.join(tmp, VECTORIZER_FILE))
+            joblib.dump(classifier, os.path.join(tmp, CLASSIFIER_FILE))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({**(meta or {}), "published_at": time.time()}, f)
+            while True:
+                existing = self.versions()
+                n = int(_VERSION_RE.match(existing[-1]).group(1)) + 1 if existing else 1
+                version = f"v{n:04d}"
+                try:
+                    os.rename(tmp, os.path.join(self.root, version))
+                    break
+                except OSError:
+                    if not os.path.isdir(os.path.join(self.root, version)):
+                        raise
+                    # Another publisher took this number; try the next one
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        """Point CURRENT at an existing version (also used for rollbacks)."""
+        if version != LEGACY_VERSION and not os.path.isdir(os.path.join(self.root, version)):
+            raise ValueError(f"Unknown model version: {version}")
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".current-", dir=self.root)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, CURRENT_FILE))
+        self._checked_at = float("-inf")
+
+    def prune(self, keep: int = 5):
+        """Delete all but the newest `keep` versions (never the active one)."""
+        active = self._active_version()
+        for version in self.versions()[:-keep] if keep > 0 else self.versions():
+            if version != active:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+
+registry = ModelRegistry(check_interval=float(os.getenv("MODEL_CHECK_INTERVAL", "5")))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Numeric, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -12,6 +12,9 @@ class User(Base):
 
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
     categories = relationship("Category", back_populates="user", cascade="all, delete-orphan")
+    merchant_rules = relationship("MerchantRule", back_populates="user", cascade="all, delete-orphan")
+    rollups = relationship("DailyRollup", cascade="all, delete-orphan")
+    import_jobs = relationship("ImportJob", cascade="all, delete-orphan")
 
 
 
@@ -20,14 +23,21 @@ class Transaction(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    amount = Column(String(50), nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
     category = Column(String(50), nullable=False)
-    date = Column(String(50), nullable=False)
+    date = Column(Date, nullable=False)
     type_ = Column(String(20), nullable=False)
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="transactions")
 
+    # Existing databases get these via migrate_native_types.py
+    __table_args__ = (
+        Index("ix_transactions_user_date", "user_id", "date"),
+        Index("ix_transactions_user_type_date", "user_id", "type_", "date"),
+        Index("ix_transactions_dedup", "user_id", "name", "amount", "date", "type_"),
+    )
+
 class Category(Base):
     __tablename__ = "categories"
 
@@ -37,3 +47,60 @@ class Category(Base):
 
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     user = relationship("User", back_populates="categories")
+
+class MerchantRule(Base):
+    __tablename__ = "merchant_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    keyword = Column(String(100), nullable=False)
+    category = Column(String(50), nullable=False)
+    merchant = Column(String(100), nullable=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    user = relationship("User", back_populates="merchant_rules")
+
+class DailyRollup(Base):
+    """Per-user (day, category, type_) sum and count of transactions; see rollups.py"""
+    __tablename__ = "daily_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True)
+    type_ = Column(String(20), primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_daily_rollups_user_type_day", "user_id", "type_", "day"),
+    )
+
+class ImportJob(Base):
+    """A background CSV import; see import_jobs.py"""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    filename = Column(String(255))
+    spool_path = Column(String(500), nullable=False)
+    # Sniffed on the first run unless given at upload
+    statement_format = Column(String(50))
+    batch_size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    # Dedup only against transactions up to this id, fixed when the job first starts
+    max_id = Column(Integer)
+
+    # Source rows are committed together with the transactions they produced,
+    # so rows_read is also the resume offset
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_classified = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    skipped_duplicates = Column(Integer, nullable=False, default=0)
+    skipped_invalid = Column(Integer, nullable=False, default=0)
+    error = Column(String(1000))
+
+    worker = Column(String(100))
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,171 @@
+# online_learning.py
+
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+
+from classifier_utils import CATEGORIES
+from lazy_imports import lazy_import
+from model_registry import BASE_DIR, registry
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ONLINE_LEARNING", "0") == "1"
+BATCH_SIZE = int(os.getenv("ONLINE_LEARNING_BATCH_SIZE", "50"))
+FLUSH_INTERVAL = float(os.getenv("ONLINE_LEARNING_FLUSH_SECONDS", "30"))
+KEEP_VERSIONS = int(os.getenv("ONLINE_LEARNING_KEEP_VERSIONS", "10"))
+SEED_CSV = os.path.join(BASE_DIR, "auto_labeled.csv")
+
+ONLINE_KIND = "online"
+
+
+def make_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    # Stateless, fixed feature space: new words never require a refit.
+    # alternate_sign=False keeps features non-negative for MultinomialNB.
+    return HashingVectorizer(
+        lowercase=True, stop_words="english", ngram_range=(1, 2),
+        n_features=2 ** 18, alternate_sign=False, norm="l2",
+    )
+
+
+def known_classes(extra=()) -> list:
+    from crud import DEFAULT_CATEGORIES
+    return sorted(set(CATEGORIES) | {c["name"] for c in DEFAULT_CATEGORIES} | set(extra))
+
+
+def _writable_copy(clf):
+    # Registry bundles are memory-mapped read-only; partial_fit needs its own arrays
+    clf = copy.deepcopy(clf)
+    for name, value in vars(clf).items():
+        if isinstance(value, np.ndarray):
+            setattr(clf, name, np.array(value))
+    return clf
+
+
+class OnlineTrainer:
+    """Folds user category corrections into the model in the background.
+
+    submit() only enqueues. A daemon thread drains the queue in batches of
+    up to batch_size (or whatever arrived within flush_interval seconds),
+    calls MultinomialNB.partial_fit on a HashingVectorizer feature space and
+    publishes the result as a new registry version. Each update costs time
+    proportional to the batch, not the corpus.
+
+    The first update after a non-online model is active seeds the online
+    model once from auto_labeled.csv.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._vectorizer = None
+        self._clf = None
+        self._version = None
+        self.stats = {"submitted": 0, "applied": 0, "skipped": 0, "batches": 0,
+                      "last_version": None, "last_error": None}
+
+    def submit(self, text: str, category: str):
+        text = (text or "").strip()
+        if not text or not category:
+            return
+        self.stats["submitted"] += 1
+        self._queue.put((text, category))
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="online-trainer", daemon=True)
+                    self._thread.start()
+
+    def _drain(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            try:
+                self.apply(batch)
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.exception("Online model update failed")
+
+    # --- Model updates ---
+    def _base_model(self):
+        """Continue from the active online version, or seed a new one."""
+        bundle = registry.current()
+        if bundle is not None and bundle.version == self._version and self._clf is not None:
+            return
+        if bundle is not None and bundle.meta.get("kind") == ONLINE_KIND:
+            self._vectorizer = bundle.vectorizer
+            self._clf = _writable_copy(bundle.classifier)
+        else:
+            self._vectorizer, self._clf = self._seed()
+        self._version = bundle.version if bundle else None
+
+    def _seed(self):
+        import pandas as pd
+        from sklearn.naive_bayes import MultinomialNB
+        vectorizer, clf = make_vectorizer(), MultinomialNB()
+        texts, labels = [], []
+        if os.path.exists(SEED_CSV):
+            df = pd.read_csv(SEED_CSV).dropna(subset=["description", "category"])
+            texts, labels = df["description"].astype(str).tolist(), df["category"].tolist()
+        classes = known_classes(labels)
+        if texts:
+            clf.partial_fit(vectorizer.transform(texts), labels, classes=classes)
+        else:
+            clf.partial_fit(vectorizer.transform([""]), [classes[0]], classes=classes)
+        return vectorizer, clf
+
+    def apply(self, batch: list):
+        self._base_model()
+        classes = set(self._clf.classes_)
+        usable = [(t, c) for t, c in batch if c in classes]
+        # MultinomialNB can't grow new classes online; those wait for a full retrain
+        self.stats["skipped"] += len(batch) - len(usable)
+        if not usable:
+            return None
+        texts, labels = zip(*usable)
+        self._clf.partial_fit(self._vectorizer.transform(list(texts)), list(labels))
+        version = registry.publish(self._vectorizer, self._clf, meta={
+            "kind": ONLINE_KIND, "base_version": self._version, "corrections": len(usable),
+        })
+        registry.prune(keep=KEEP_VERSIONS)
+        self._version = version
+        self.stats["applied"] += len(usable)
+        self.stats["batches"] += 1
+        self.stats["last_version"] = version
+        return version
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+
+trainer = OnlineTrainer()
+
+
+def record_correction(text: str, category: str):
+    """Queue a user's category fix for the next online update (no-op unless ONLINE_LEARNING=1)."""
+    if ENABLED:
+        trainer.submit(text, category)
@@ -0,0 +1,212 @@
+# rollups.py
+"""Per-user (day, category, type_) sums and counts of transactions.
+
+Every write path (crud create/update/delete and the CSV importer) applies a
+RollupDelta in the same DB transaction as the rows it changes, so the
+analytics endpoints can read daily_rollups instead of scanning transactions.
+
+    python rollups.py rebuild [--user-id N]      # backfill from transactions
+    python rollups.py check [--user-id N] [--fix]  # compare against transactions
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import delete, func, insert, select
+
+import models
+
+CENT = Decimal("0.01")
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def to_amount(value) -> Decimal:
+    try:
+        return Decimal(str(value)).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        return Decimal(0)
+
+
+class RollupDelta:
+    """Accumulates signed (total, count) changes per rollup key."""
+
+    def __init__(self):
+        self._changes = defaultdict(lambda: [Decimal(0), 0])
+
+    def add(self, user_id, day, category, type_, total, count: int = 1):
+        day = to_date(day)
+        if day is None:
+            return self
+        change = self._changes[(user_id, day, category, type_)]
+        change[0] += to_amount(total)
+        change[1] += count
+        return self
+
+    def add_txn(self, txn, sign: int = 1):
+        return self.add(txn.user_id, txn.date, txn.category, txn.type_, sign * to_amount(txn.amount), sign)
+
+    def remove_txn(self, txn):
+        return self.add_txn(txn, -1)
+
+    def rows(self) -> list:
+        return [
+            {"user_id": k[0], "day": k[1], "category": k[2], "type_": k[3], "total": v[0], "count": v[1]}
+            for k, v in self._changes.items() if v[1] or v[0]
+        ]
+
+
+def _upsert_statement(dialect_name: str):
+    R = models.DailyRollup
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(R)
+        return stmt.on_duplicate_key_update(total=R.total + stmt.inserted.total,
+                                            count=R.count + stmt.inserted.count)
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(R)
+        return stmt.on_conflict_do_update(
+            index_elements=[R.user_id, R.day, R.category, R.type_],
+            set_={"total": R.total + stmt.excluded.total, "count": R.count + stmt.excluded.count},
+        )
+    return None
+
+
+def apply(db, delta: RollupDelta):
+    """Upsert the delta into daily_rollups. Does not commit."""
+    rows = delta.rows()
+    if not rows:
+        return
+    R = models.DailyRollup
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+    else:
+        for row in rows:
+            key = (row["user_id"], row["day"], row["category"], row["type_"])
+            existing = db.get(R, key)
+            if existing is None:
+                db.add(R(**row))
+            else:
+                existing.total += row["total"]
+                existing.count += row["count"]
+        db.flush()
+    if any(r["count"] < 0 for r in rows):
+        db.execute(delete(R).where(R.user_id.in_({r["user_id"] for r in rows}), R.count <= 0))
+
+
+# --- Backfill / consistency ---
+def _raw_aggregate(user_id):
+    T = models.Transaction
+    return select(
+        T.user_id, T.date, T.category, T.type_,
+        func.sum(T.amount), func.count(),
+    ).where(T.user_id == user_id).group_by(T.user_id, T.date, T.category, T.type_)
+
+
+def rebuild_user(db, user_id: int) -> int:
+    """Recompute one user's rollups from the raw table in a single transaction."""
+    R = models.DailyRollup
+    db.execute(delete(R).where(R.user_id == user_id))
+    delta = RollupDelta()
+    for uid, day, category, type_, total, count in db.execute(_raw_aggregate(user_id)):
+        delta.add(uid, day, category, type_, total, count)
+    rows = delta.rows()
+    if rows:
+        db.execute(insert(R), rows)
+    db.commit()
+    return len(rows)
+
+
+def user_ids(db, user_id=None) -> list:
+    if user_id is not None:
+        return [user_id]
+    return list(db.scalars(select(models.User.id).order_by(models.User.id)))
+
+
+def users_without_rollups(db) -> list:
+    """Users with transactions but no rollup rows -- data from before rollups
+    existed, which the analytics endpoints would report as empty."""
+    U, T, R = models.User, models.Transaction, models.DailyRollup
+    return list(db.scalars(select(U.id).where(
+        select(T.id).where(T.user_id == U.id).exists(),
+        ~select(R.user_id).where(R.user_id == U.id).exists(),
+    ).order_by(U.id)))
+
+
+def rebuild(db, user_id=None) -> int:
+    """Backfill rollups user by user, committing after each so locks stay short."""
+    return sum(rebuild_user(db, uid) for uid in user_ids(db, user_id))
+
+
+def check_user(db, user_id: int, tolerance: Decimal = CENT) -> list:
+    """Return [(key, expected, actual)] for every rollup that disagrees with transactions."""
+    R = models.DailyRollup
+    expected = defaultdict(lambda: (Decimal(0), 0))
+    for _, day, category, type_, total, count in db.execute(_raw_aggregate(user_id)):
+        key = (to_date(day), category, type_)
+        t, c = expected[key]
+        expected[key] = (t + to_amount(total), c + count)
+    actual = {
+        (to_date(day), category, type_): (to_amount(total), count)
+        for day, category, type_, total, count in db.execute(
+            select(R.day, R.category, R.type_, R.total, R.count).where(R.user_id == user_id))
+    }
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        e, a = expected.get(key, (Decimal(0), 0)), actual.get(key, (Decimal(0), 0))
+        if e[1] != a[1] or abs(e[0] - a[0]) > tolerance:
+            mismatches.append((key, e, a))
+    return mismatches
+
+
+def check(db, user_id=None, fix: bool = False) -> dict:
+    report = {}
+    for uid in user_ids(db, user_id):
+        mismatches = check_user(db, uid)
+        if mismatches:
+            report[uid] = mismatches
+            if fix:
+                rebuild_user(db, uid)
+    return report
+
+
+def main():
+    from database import SessionLocal, engine
+    parser = argparse.ArgumentParser(description="Maintain the daily_rollups table")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--fix", action="store_true", help="rebuild users that fail the check")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine, tables=[models.DailyRollup.__table__])
+    with SessionLocal() as db:
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild(db, args.user_id)} rollup rows")
+            return
+        report = check(db, args.user_id, fix=args.fix)
+        for uid, mismatches in report.items():
+            print(f"user {uid}: {len(mismatches)} mismatched rollups")
+            for key, expected, actual in mismatches[:20]:
+                print(f"  {key}: expected {expected}, found {actual}")
+        print("OK" if not report else ("Fixed" if args.fix else "Inconsistent"))
+        raise SystemExit(1 if report and not args.fix else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import datetime
+import os
 from datetime import date
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
+
+MAX_BATCH_SIZE = int(os.getenv("TRANSACTION_BATCH_MAX", "1000"))
 
 # --- User Schemas ---
 class UserBase(BaseModel):
@@ -38,6 +42,47 @@ class Transaction(TransactionBase):
     class Config:
         from_attributes = True
 
+# --- Transaction batch schemas ---
+class TransactionUpdate(BaseModel):
+    """Fields to change; omitted fields keep their values."""
+    name: Optional[str] = None
+    amount: Optional[float] = None
+    category: Optional[str] = None
+    date: Optional[datetime.date] = None  # qualified: the field name shadows `date` here
+    type_: Optional[str] = None
+
+class BatchCreate(BaseModel):
+    op: Literal["create"]
+    data: TransactionCreate
+
+class BatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    data: TransactionUpdate
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+BatchOperation = Annotated[Union[BatchCreate, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+class TransactionBatch(BaseModel):
+    # Checked while parsing, so an oversized batch fails before its items are validated
+    operations: list[BatchOperation] = Field(max_length=MAX_BATCH_SIZE)
+
+class BatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    id: Optional[int] = None
+    transaction: Optional[Transaction] = None
+    error: Optional[str] = None
+
+class TransactionBatchResult(BaseModel):
+    applied: int
+    failed: int
+    results: list[BatchResult]
+
 # --- Category Schemas ---
 class CategoryBase(BaseModel):
     name: str
@@ -51,4 +96,20 @@ class Category(CategoryBase):
     user_id: Optional[int] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Merchant Rule Schemas ---
+class MerchantRuleBase(BaseModel):
+    keyword: str
+    category: str
+    merchant: Optional[str] = None
+
+class MerchantRuleCreate(MerchantRuleBase):
+    pass
+
+class MerchantRule(MerchantRuleBase):
+    id: int
+    user_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,103 @@
+# startup.py
+"""Schema and seed work kept off the import path, and boot timings.
+
+init_db() creates missing tables and inserts the missing default
+categories (one SELECT, one multi-row INSERT). main's lifespan hook runs
+it unless DB_INIT_ON_STARTUP=0; with many workers, turn that off and run
+it once per deploy instead (this also runs backfill_rollups):
+
+    python startup.py --init-db
+
+backfill_rollups() runs on every start: users whose transactions have no
+daily_rollups yet (a database from before rollups) get them rebuilt, or with
+ROLLUP_BACKFILL_ON_STARTUP=0 a warning naming `python rollups.py rebuild`.
+
+Boot phases (importing main, init_db, backfill_rollups, resuming import
+jobs) are logged when the app is up and exported by GET /metrics as
+startup_seconds_<phase>. For a per-module import breakdown see
+benchmarks/cold_start.py.
+"""
+
+import argparse
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+INIT_DB_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "1") == "1"
+BACKFILL_ROLLUPS = os.getenv("ROLLUP_BACKFILL_ON_STARTUP", "1") == "1"
+
+TIMINGS = {}
+
+
+def record(name: str, seconds: float):
+    TIMINGS[name] = round(seconds, 4)
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def report() -> str:
+    return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in TIMINGS.items())
+
+
+def log_ready():
+    logger.info("Worker ready: %s", report())
+
+
+def init_db() -> int:
+    """Create missing tables and seed default categories; returns categories added."""
+    import crud, models
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        return crud.seed_default_categories(db)
+
+
+def backfill_rollups(rebuild: bool = BACKFILL_ROLLUPS) -> list:
+    """Find users with transactions but no rollups and rebuild theirs (or
+    only log them); returns their ids."""
+    import analytics_cache, rollups
+    from database import SessionLocal
+    from sqlalchemy.exc import IntegrityError
+    with SessionLocal() as db:
+        missing = rollups.users_without_rollups(db)
+        if not missing:
+            return missing
+        if not rebuild:
+            logger.warning("%d users have transactions but no daily_rollups, so their analytics are empty; "
+                           "run `python rollups.py rebuild`", len(missing))
+            return missing
+        for user_id in missing:
+            try:
+                rollups.rebuild_user(db, user_id)
+            except IntegrityError:
+                db.rollback()  # another worker starting up rebuilt this user first
+            analytics_cache.bump(user_id)
+    logger.info("Rebuilt daily_rollups for %d users with transactions but no rollups", len(missing))
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-time database setup")
+    parser.add_argument("--init-db", action="store_true", help="create tables and seed default categories")
+    args = parser.parse_args()
+    if not args.init_db:
+        parser.error("nothing to do (pass --init-db)")
+    with phase("init_db"):
+        added = init_db()
+    with phase("backfill_rollups"):
+        rebuilt = backfill_rollups(rebuild=True)
+    print(f"Schema ready, {added} default categories added, rollups rebuilt for {len(rebuilt)} users ({report()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# conftest.py
+import itertools
+import os
+import sys
+import tempfile
+import warnings
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A scratch SQLite database, set before database.py reads the environment
+# (load_dotenv does not override variables that are already set)
+_workdir = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["IMPORT_SPOOL_DIR"] = os.path.join(_workdir, "spool")
+
+_mobiles = itertools.count(9000000000)
+
+
+@pytest.fixture(scope="session")
+def client():
+    warnings.filterwarnings("ignore")
+    from fastapi.testclient import TestClient
+    import main
+    with TestClient(main.app) as c:  # runs the lifespan: schema and seed
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def make_user(client):
+    def make():
+        r = client.post("/signup", json={"name": "test", "mobile": str(next(_mobiles)), "password": "x"})
+        r.raise_for_status()
+        return r.json()["id"]
+    return make
+
+
+@pytest.fixture
+def user_id(make_user):
+    """A fresh user per test."""
+    return make_user()
@@ -0,0 +1,51 @@
+# test_categories.py
+import category_catalog
+import models
+
+
+def test_defaults_and_own_categories(client, user_id):
+    r = client.post("/categories/", params={"user_id": user_id}, json={"name": "Pets", "icon": "p"})
+    assert r.status_code == 200
+    names = [c["name"] for c in client.get("/categories/", params={"user_id": user_id}).json()]
+    assert {"Food", "Rent", "Pets"} <= set(names)
+    r = client.post("/categories/", params={"user_id": user_id}, json={"name": "Pets", "icon": "p"})
+    assert r.status_code == 400
+
+
+def test_duplicate_check_ignores_a_stale_catalog(client, db, user_id):
+    client.get("/categories/", params={"user_id": user_id})  # cached without the new one
+    db.add(models.Category(name="Garden", icon="g", user_id=user_id))  # as another worker would
+    db.commit()
+    r = client.post("/categories/", params={"user_id": user_id}, json={"name": "Garden", "icon": "g"})
+    assert r.status_code == 400
+
+
+def test_merchant_rule_needs_a_known_category(client, user_id):
+    r = client.post("/merchant_rules/", params={"user_id": user_id},
+                    json={"keyword": "ACME", "category": "NoSuchCat"})
+    assert r.status_code == 422
+    r = client.post("/merchant_rules/", params={"user_id": user_id},
+                    json={"keyword": "ACME", "category": "Shopping"})
+    assert r.status_code == 200
+
+
+def test_merchant_rule_sees_a_category_from_another_worker(client, db, user_id):
+    client.get("/categories/", params={"user_id": user_id})
+    db.add(models.Category(name="Hobbies", icon="h", user_id=user_id))
+    db.commit()
+    r = client.post("/merchant_rules/", params={"user_id": user_id},
+                    json={"keyword": "MODEL SHOP", "category": "Hobbies"})
+    assert r.status_code == 200
+
+
+def test_catalog_is_not_cached_before_defaults_are_seeded(db, user_id, monkeypatch):
+    monkeypatch.setattr(category_catalog, "_defaults", None)
+    category_catalog.invalidate(user_id)
+    db.query(models.Category).filter(models.Category.user_id.is_(None)).update({"user_id": -1})
+    try:
+        assert "Food" not in category_catalog.for_user(db, user_id)
+        assert category_catalog.cached(user_id) is None
+    finally:
+        db.rollback()
+    assert "Food" in category_catalog.for_user(db, user_id)
+    assert category_catalog.cached(user_id) is not None
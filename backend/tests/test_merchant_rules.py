@@ -0,0 +1,104 @@
+# test_merchant_rules.py
+import pytest
+
+import classifier_utils
+import merchant_rules
+import models
+from merchant_rules import KeywordMatcher, RuleSet
+
+
+def test_matcher_picks_lowest_priority_anywhere_in_text():
+    matcher = KeywordMatcher()
+    for priority, keyword in enumerate(["SWIGGY", "WIG", "HE", "SHE", "HERS"]):
+        matcher.add(keyword, keyword, priority)
+    assert matcher.match("PAY SWIGGY 12")[1] == "SWIGGY"
+    assert matcher.match("USHERS")[1] == "HE"
+    assert matcher.match("NOTHING HERE") == (2, "HE")
+    assert matcher.match("XYZ") is None
+    matcher.add("XYZ", "XYZ", 10)
+    assert matcher.match("XYZ")[1] == "XYZ"
+
+
+def test_user_rules_beat_global_and_first_added_wins():
+    base = RuleSet()
+    base.add("AMAZON", "Shopping")
+    user = RuleSet(parent=base)
+    user.add("AMAZON PRIME", "Entertainment", "Prime")
+    user.add("PRIME", "Bills")
+    assert user.match("AMAZON PRIME VIDEO") == ("Prime", "Entertainment")
+    assert user.match("AMAZON PAY") == ("Amazon", "Shopping")
+
+
+def test_version_depends_on_content_only():
+    def build(*rules):
+        ruleset = RuleSet()
+        for rule in rules:
+            ruleset.add(*rule)
+        return ruleset
+    a = build(("UBER", "Transport"), ("OLA", "Transport"))
+    assert a.version == build(("UBER", "Transport"), ("OLA", "Transport")).version
+    assert a.version != build(("OLA", "Transport"), ("UBER", "Transport")).version
+    assert a.copy().version == a.version
+    assert RuleSet(parent=a).version == a.version  # no rules of its own
+    before = a.version
+    a.add("RAPIDO", "Transport")
+    assert a.version != before
+
+
+@pytest.fixture
+def fresh_rule_caches():
+    merchant_rules._user_rules.clear()
+    merchant_rules._global = None
+    yield
+    merchant_rules._user_rules.clear()
+    merchant_rules._global = None
+
+
+def test_reloaded_rules_keep_their_version(db, user_id, fresh_rule_caches):
+    db.add(models.MerchantRule(keyword="CORNER CAFE", category="Food", user_id=user_id))
+    db.commit()
+    first = classifier_utils.rules_for_user(db, user_id)
+    version = first.version
+    # What a TTL expiry does: drop both cached sets and read them again
+    merchant_rules._user_rules.clear()
+    merchant_rules._global = None
+    again = classifier_utils.rules_for_user(db, user_id)
+    assert again is not first
+    assert again.version == version
+    assert again.match("PAY CORNER CAFE") == ("Corner Cafe", "Food")
+
+
+def test_classifications_survive_a_reload(db, user_id, fresh_rule_caches):
+    descs = [f"UPI/{i}/SOME PAYEE {i}" for i in range(20)]
+    classifier_utils.classify_batch(descs, classifier_utils.rules_for_user(db, user_id))
+    merchant_rules._user_rules.clear()
+    merchant_rules._global = None
+    hits = classifier_utils.CLASSIFY_CACHE.hits
+    classifier_utils.classify_batch(descs, classifier_utils.rules_for_user(db, user_id))
+    assert classifier_utils.CLASSIFY_CACHE.hits - hits == len(descs)
+
+
+def test_users_without_rules_share_cache_keys(db, make_user, fresh_rule_caches):
+    a, b = make_user(), make_user()
+    assert classifier_utils.rules_for_user(db, a).version == classifier_utils.rules_for_user(db, b).version
+
+
+def test_global_db_rules_rank_below_builtin_merchants(db, user_id, fresh_rule_caches):
+    db.add(models.MerchantRule(keyword="SWIGGY", category="Bills", user_id=None))
+    db.add(models.MerchantRule(keyword="ACME WIDGETS", category="Shopping", user_id=None))
+    db.commit()
+    try:
+        rules = classifier_utils.rules_for_user(db, user_id)
+        assert rules.match("SWIGGY ORDER")[1] == "Food"
+        assert rules.match("ACME WIDGETS LTD")[1] == "Shopping"
+    finally:
+        db.query(models.MerchantRule).filter(models.MerchantRule.user_id.is_(None)).delete()
+        db.commit()
+
+
+def test_new_rule_applies_at_once(client, db, user_id, fresh_rule_caches):
+    classifier_utils.rules_for_user(db, user_id)  # cached before the rule exists
+    r = client.post("/merchant_rules/", params={"user_id": user_id},
+                    json={"keyword": "GYMBOX", "category": "Entertainment"})
+    assert r.status_code == 200
+    assert classifier_utils.rules_for_user(db, user_id).match("GYMBOX MONTHLY")[1] == "Entertainment"
@@ -0,0 +1,59 @@
+# test_rollups.py
+from datetime import date
+
+import pytest
+
+import analytics
+import models
+import rollups
+import startup
+
+TXN = {"name": "Cafe", "amount": 100.0, "category": "Food", "date": "2025-03-01", "type_": "Expense"}
+
+
+def test_single_row_writes_keep_rollups_exact(client, db, user_id):
+    ids = [client.post("/transactions/", params={"user_id": user_id},
+                       json={**TXN, "amount": 10.1 * (i + 1), "date": f"2025-03-0{i + 1}"}).json()["id"]
+           for i in range(3)]
+    client.put(f"/transactions/{ids[0]}", params={"user_id": user_id},
+               json={**TXN, "amount": 0.3, "date": "2025-02-28", "category": "Bills"})
+    client.delete(f"/transactions/{ids[1]}", params={"user_id": user_id})
+    assert rollups.check_user(db, user_id) == []
+    rows = db.query(models.DailyRollup).filter_by(user_id=user_id).all()
+    assert {(r.day, r.category, float(r.total), r.count) for r in rows} == {
+        (date(2025, 2, 28), "Bills", 0.3, 1), (date(2025, 3, 3), "Food", 30.3, 1)}
+
+
+def test_import_writes_rollups(client, db, user_id):
+    statement = ("Txn Date,Description,Credit Amount,Debit Amount\n"
+                 "01/03/2025,SWIGGY ORDER,,250.00\n"
+                 "01/03/2025,SWIGGY ORDER 2,,\"1,000.00\"\n"
+                 "02/03/2025,SALARY MARCH,50000.00,\n")
+    r = client.post("/upload_csv/", params={"user_id": user_id},
+                    files={"file": ("s.csv", statement.encode(), "text/csv")})
+    assert r.status_code == 200 and r.json()["inserted"] == 3
+    assert rollups.check_user(db, user_id) == []
+    assert analytics.expense_total(db, user_id, date(2025, 3, 1), date(2025, 3, 31)) == pytest.approx(1250.0)
+
+
+def _legacy_user(client, db, user_id):
+    """Transactions without rollups, as in a database from before rollups."""
+    client.post("/transactions/", params={"user_id": user_id}, json=TXN)
+    db.query(models.DailyRollup).filter_by(user_id=user_id).delete()
+    db.commit()
+
+
+def test_startup_rebuilds_missing_rollups(client, db, user_id):
+    _legacy_user(client, db, user_id)
+    assert user_id in rollups.users_without_rollups(db)
+    assert user_id in startup.backfill_rollups(rebuild=True)
+    assert user_id not in rollups.users_without_rollups(db)
+    assert rollups.check_user(db, user_id) == []
+
+
+def test_startup_can_only_warn(client, db, user_id, caplog):
+    _legacy_user(client, db, user_id)
+    assert user_id in startup.backfill_rollups(rebuild=False)
+    assert "rollups.py rebuild" in caplog.text
+    assert user_id in rollups.users_without_rollups(db)
+    rollups.rebuild_user(db, user_id)
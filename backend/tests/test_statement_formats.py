@@ -0,0 +1,99 @@
+# test_statement_formats.py
+import math
+
+import pandas as pd
+import pytest
+
+import statement_formats
+from statement_formats import amount_parser, parse_amounts
+
+NAN = math.nan
+
+WESTERN = [
+    # bare numbers (the float() fast path)
+    ("1234.5", 1234.5),
+    ("-42", -42.0),
+    ("+7", 7.0),
+    (".5", 0.5),
+    (" 12 ", 12.0),
+    # grouping
+    ("1,234,567.00", 1234567.0),
+    ("12,34,567.00", 1234567.0),
+    ("1,00,000", 100000.0),
+    ("999,999", 999999.0),
+    ("1,23,456,789", NAN),   # Indian and Western grouping mixed
+    ("1,234,56", NAN),
+    ("1,5", NAN),
+    ("1,2345", NAN),
+    ("1_000", NAN),
+    ("1_000.50", NAN),
+    # currency prefixes and (negatives)
+    ("₹ 1,000", 1000.0),
+    ("Rs. 500", 500.0),
+    ("rs 500", 500.0),
+    ("INR 12.5", 12.5),
+    ("$3.99", 3.99),
+    ("(1,000.50)", -1000.5),
+    ("(₹ 250)", -250.0),
+    # not numbers
+    ("", NAN),
+    ("abc", NAN),
+    ("12abc", NAN),
+    ("inf", NAN),
+    ("nan", NAN),
+    (None, NAN),
+]
+
+EUROPEAN = [
+    ("1.234,56", 1234.56),
+    ("1,5", 1.5),
+    ("1.234.567", 1234567.0),
+    ("1.5", NAN),
+    ("(2.000,00)", -2000.0),
+]
+
+
+def _same(a, b):
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+@pytest.mark.parametrize("text, expected", WESTERN)
+def test_amount_parser_western(text, expected):
+    assert _same(amount_parser()(text), expected)
+
+
+@pytest.mark.parametrize("text, expected", EUROPEAN)
+def test_amount_parser_european(text, expected):
+    assert _same(amount_parser(thousands=".", decimal=",")(text), expected)
+
+
+def test_parse_amounts_matches_amount_parser():
+    texts = [t for t, _ in WESTERN] * 2
+    parsed = parse_amounts(pd.Series(texts, dtype=object))
+    assert [_same(a, b) for a, b in zip(parsed, [e for _, e in WESTERN] * 2)] == [True] * len(texts)
+
+
+@pytest.mark.parametrize("credit, debit, amount, is_income", [
+    ("300.00", None, 300.0, True),
+    (None, "1,000.50", 1000.5, False),
+    (None, "(1,000.50)", 1000.5, False),
+    ("(200)", None, 200.0, False),
+])
+def test_split_amounts_are_non_negative(credit, debit, amount, is_income):
+    fmt = statement_formats.get("indian_bank")
+    df = pd.DataFrame({"credit": [credit], "debit": [debit]}, dtype=object)
+    values, income = fmt.amounts(df)
+    assert values.iloc[0] == amount
+    assert bool(income.iloc[0]) is is_income
+
+
+@pytest.mark.parametrize("text, amount, is_income", [
+    ("-50", 50.0, False),
+    ("(50)", 50.0, False),
+    ("75", 75.0, True),
+])
+def test_signed_amounts(text, amount, is_income):
+    fmt = statement_formats.get("generic")
+    values, income = fmt.amounts(pd.DataFrame({"amount": [text]}, dtype=object))
+    assert values.iloc[0] == amount
+    assert bool(income.iloc[0]) is is_income
@@ -0,0 +1,109 @@
+# test_transaction_batch.py
+import pytest
+
+import rollups
+import schemas
+
+TXN = {"name": "Cafe", "amount": 100.0, "category": "Food", "date": "2025-03-01", "type_": "Expense"}
+
+
+@pytest.fixture
+def txns(client, user_id):
+    """Three stored transactions of the test user."""
+    return [client.post("/transactions/", params={"user_id": user_id}, json={**TXN, "amount": 100.0 + i}).json()
+            for i in range(3)]
+
+
+def batch(client, user_id, operations, **params):
+    return client.post("/transactions/batch", params={"user_id": user_id, **params}, json={"operations": operations})
+
+
+def stored(client, user_id):
+    return {t["id"]: t for t in client.get("/transactions/", params={"user_id": user_id}).json()}
+
+
+def test_results_per_operation(client, user_id, make_user, txns):
+    other = make_user()
+    foreign = client.post("/transactions/", params={"user_id": other}, json=TXN).json()["id"]
+    r = batch(client, user_id, [
+        {"op": "update", "id": txns[0]["id"], "data": {"category": "Bills"}},
+        {"op": "delete", "id": txns[1]["id"]},
+        {"op": "delete", "id": txns[1]["id"]},
+        {"op": "delete", "id": foreign},
+        {"op": "update", "id": txns[2]["id"], "data": {"category": "NoSuchCat"}},
+        {"op": "create", "data": {**TXN, "name": "New"}},
+    ])
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["applied"], body["failed"]) == (3, 3)
+    assert [x["status"] for x in body["results"]] == [200, 200, 409, 404, 422, 201]
+    assert body["results"][0]["transaction"]["category"] == "Bills"
+    new_id = body["results"][5]["id"]
+
+    rows = stored(client, user_id)
+    assert set(rows) == {txns[0]["id"], txns[2]["id"], new_id}
+    assert rows[txns[0]["id"]]["category"] == "Bills"
+    assert rows[txns[2]["id"]]["category"] == "Food"
+    assert foreign in stored(client, other)
+
+
+def test_partial_update_keeps_other_fields(client, user_id, txns):
+    r = batch(client, user_id, [{"op": "update", "id": txns[0]["id"], "data": {"amount": 5.5}}])
+    assert r.json()["results"][0]["status"] == 200
+    row = stored(client, user_id)[txns[0]["id"]]
+    assert (row["amount"], row["name"], row["category"], row["date"]) == (5.5, "Cafe", "Food", "2025-03-01")
+
+
+def test_atomic_batch_is_all_or_nothing(client, user_id, txns):
+    r = batch(client, user_id, [{"op": "delete", "id": txns[0]["id"]},
+                                {"op": "delete", "id": 10 ** 9}], atomic="true")
+    assert r.status_code == 409
+    assert [x["status"] for x in r.json()["results"]] == [424, 404]
+    assert r.json()["applied"] == 0
+    assert txns[0]["id"] in stored(client, user_id)
+
+    r = batch(client, user_id, [{"op": "delete", "id": txns[0]["id"]}], atomic="true")
+    assert r.status_code == 200
+    assert txns[0]["id"] not in stored(client, user_id)
+
+
+def test_batch_size_is_capped_by_the_schema(client, user_id):
+    too_many = [{"op": "delete", "id": 10 ** 9}] * (schemas.MAX_BATCH_SIZE + 1)
+    assert batch(client, user_id, too_many).status_code == 422
+    r = batch(client, user_id, too_many[:schemas.MAX_BATCH_SIZE])
+    assert r.status_code == 200 and r.json()["failed"] == schemas.MAX_BATCH_SIZE
+
+
+def test_unknown_op_is_rejected(client, user_id):
+    assert batch(client, user_id, [{"op": "upsert", "id": 1}]).status_code == 422
+
+
+def test_rollups_follow_date_and_amount_moves(client, db, user_id, txns):
+    r = batch(client, user_id, [
+        {"op": "update", "id": txns[0]["id"], "data": {"date": "2024-12-31"}},
+        {"op": "update", "id": txns[1]["id"], "data": {"amount": 999.99, "type_": "Income", "category": "Salary"}},
+        {"op": "delete", "id": txns[2]["id"]},
+        {"op": "create", "data": {**TXN, "date": "2025-04-15", "amount": 42.0}},
+    ])
+    assert r.json()["failed"] == 0
+    assert rollups.check_user(db, user_id) == []
+
+
+def test_writes_invalidate_cached_analytics(client, user_id, txns):
+    first = client.get("/analytics/dashboard", params={"user_id": user_id})
+    etag = first.headers["etag"]
+    assert client.get("/analytics/dashboard", params={"user_id": user_id},
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    batch(client, user_id, [{"op": "update", "id": txns[0]["id"], "data": {"amount": 1000.0}}])
+    after = client.get("/analytics/dashboard", params={"user_id": user_id}, headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+    assert after.json() != first.json()
+
+
+def test_failed_batch_leaves_cache_alone(client, user_id):
+    etag = client.get("/analytics/dashboard", params={"user_id": user_id}).headers["etag"]
+    batch(client, user_id, [{"op": "delete", "id": 10 ** 9}])
+    assert client.get("/analytics/dashboard", params={"user_id": user_id},
+                      headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,30 @@
+# test_transactions.py
+from datetime import date
+
+import models
+
+TXN = {"name": "Cafe", "amount": 120.0, "category": "Food", "date": "2025-03-01", "type_": "Expense"}
+
+
+def test_create_rejects_unknown_category(client, user_id):
+    r = client.post("/transactions/", params={"user_id": user_id}, json={**TXN, "category": "WhateverCat"})
+    assert r.status_code == 422
+    assert client.get("/transactions/", params={"user_id": user_id}).json() == []
+
+
+def test_update_rejects_unknown_category(client, user_id):
+    txn = client.post("/transactions/", params={"user_id": user_id}, json=TXN).json()
+    r = client.put(f"/transactions/{txn['id']}", params={"user_id": user_id}, json={**TXN, "category": "WhateverCat"})
+    assert r.status_code == 422
+    r = client.put(f"/transactions/{txn['id']}", params={"user_id": user_id}, json={**TXN, "category": "Bills"})
+    assert r.status_code == 200 and r.json()["category"] == "Bills"
+
+
+def test_update_keeps_an_unchecked_legacy_category(client, db, user_id):
+    # Stored before categories were validated (bypasses rollups; this user only)
+    legacy = models.Transaction(**{**TXN, "date": date(2024, 1, 1), "category": "Old Label"}, user_id=user_id)
+    db.add(legacy)
+    db.commit()
+    r = client.put(f"/transactions/{legacy.id}", params={"user_id": user_id},
+                   json={**TXN, "category": "Old Label", "amount": 99.0})
+    assert r.status_code == 200
@@ -1,28 +1,36 @@
-import io
-import pandas as pd
-from classifier_utils import classify_transaction_simple
-
-# --- 1) Read raw CSV & detect header ---
-with open("labeled_transactions.csv", encoding="utf-8", errors="ignore") as f:
-    raw = f.read().splitlines()
-
-# Find the header line containing "Description"
-hdr_idx = next(i for i, ln in enumerate(raw) if "Description" in ln)
-df = pd.read_csv(io.StringIO("\n".join(raw[hdr_idx:])), header=0)
-
-# --- 2) Clean + normalize ---
-df.columns = [c.strip() for c in df.columns]
-desc_col = next(c for c in df.columns if "desc" in c.lower())
-df = df[[desc_col]].rename(columns={desc_col: "description"})
-
-df = df[df["description"].notna()].copy()
-df["description"] = df["description"].astype(str).str.strip()
-df = df[df["description"] != ""]
-
-# --- 3) Apply classification logic ---
-results = df["description"].apply(classify_transaction_simple)
-df["merchant"], df["category"] = zip(*results)
-
-# --- 4) Save labeled data ---
-df.to_csv("auto_labeled.csv", index=False)
-print(f"✅ Auto-labeled {len(df)} rows → saved to auto_labeled.csv")
+import argparse
+import statement_formats
+from classifier_utils import WORKERS, classify_batch, shutdown_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-label a bank statement with the rule/ML classifier")
+    parser.add_argument("--input", default="labeled_transactions.csv", help="statement in any registered format")
+    parser.add_argument("--output", default="auto_labeled.csv")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="classifier processes (default: CLASSIFIER_WORKERS, 1 = in-process)")
+    args = parser.parse_args()
+
+    # --- 1) Read raw CSV & detect the statement format ---
+    with open(args.input, encoding="utf-8", errors="ignore") as f:
+        fmt, df = statement_formats.read_text(f.read())
+
+    # --- 2) Clean + normalize ---
+    df = df[["description"]]
+    df = df[df["description"].notna()].copy()
+    df["description"] = df["description"].astype(str).str.strip()
+    df = df[df["description"] != ""]
+
+    # --- 3) Apply classification logic ---
+    results = classify_batch(df["description"], workers=args.workers)
+    df["merchant"], df["category"] = zip(*results)
+    shutdown_pool()
+
+    # --- 4) Save labeled data ---
+    df.to_csv(args.output, index=False)
+    print(f"✅ Auto-labeled {len(df)} rows ({fmt.name} format) → saved to {args.output}")
+
+
+# Guarded: classifier worker processes are spawned and re-import this module
+if __name__ == "__main__":
+    main()
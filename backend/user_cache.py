@@ -0,0 +1,106 @@
+# user_cache.py
+"""Which user ids are known to exist, so requests can skip the users lookup.
+
+Only existing ids are cached. An unknown id always goes to the database,
+so a user who just signed up is visible immediately. Signup primes the
+cache. Deleting a user removes the id.
+
+The local backend is per process. With several workers, a deletion is seen
+by the other workers only after USER_CACHE_TTL seconds. Set
+USER_CACHE_BACKEND=redis (and USER_CACHE_URL) so all workers share one set
+and a delete takes effect everywhere at once.
+"""
+
+import logging
+import os
+
+from cache_utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.getenv("USER_CACHE_BACKEND", "local")
+TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+MAX_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))
+REDIS_URL = os.getenv("USER_CACHE_URL", "redis://localhost:6379/0")
+
+
+class LocalBackend:
+    def __init__(self, maxsize: int = MAX_SIZE, ttl: float = TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def contains(self, user_id: int) -> bool:
+        return self._cache.get(user_id, False)
+
+    def add(self, user_id: int):
+        self._cache.put(user_id, True)
+
+    def discard(self, user_id: int):
+        self._cache.pop(user_id)
+
+    def stats(self) -> dict:
+        return {"backend": "local", **self._cache.stats()}
+
+
+class RedisBackend:
+    """Shared across workers. Redis errors count as misses, so an outage only
+    costs the database lookup the cache would have saved."""
+
+    prefix = "finance:user:"
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = TTL):
+        import redis
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.ttl = int(ttl)
+        self.hits = self.misses = self.errors = 0
+
+    def contains(self, user_id: int) -> bool:
+        try:
+            found = bool(self._redis.exists(f"{self.prefix}{user_id}"))
+        except Exception:
+            self.errors += 1
+            return False
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def add(self, user_id: int):
+        try:
+            self._redis.set(f"{self.prefix}{user_id}", 1, ex=self.ttl)
+        except Exception:
+            self.errors += 1
+
+    def discard(self, user_id: int):
+        # A failure here would leave a deleted user cached; surface it
+        self._redis.delete(f"{self.prefix}{user_id}")
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+def make_backend(name: str = BACKEND):
+    if name == "redis":
+        return RedisBackend()
+    if name != "local":
+        logger.warning("Unknown USER_CACHE_BACKEND %r, using local", name)
+    return LocalBackend()
+
+
+backend = make_backend()
+
+
+def known(user_id: int) -> bool:
+    return backend.contains(user_id)
+
+
+def remember(user_id: int):
+    backend.add(user_id)
+
+
+def forget(user_id: int):
+    backend.discard(user_id)
+
+
+def stats() -> dict:
+    return backend.stats()
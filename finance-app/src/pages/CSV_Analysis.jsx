@@ -12,13 +12,31 @@ function CSVUpload() {
     formData.append("file", file);
 
     try {
-      const res = await fetch(`http://127.0.0.1:8000/upload_csv/?user_id=${user_id}`, {
+      const res = await fetch(`http://127.0.0.1:8000/upload_csv/?user_id=${user_id}&background=true`, {
         method: "POST",
         body: formData,
       });
 
       const data = await res.json();
-      setMessage(data.message || "✅ Upload complete.");
+      if (!data.job_id) {
+        setMessage(data.detail || data.message || "❌ Upload failed.");
+        return;
+      }
+
+      // The import runs in the background; poll its progress
+      let job = data;
+      while (job.status === "queued" || job.status === "running") {
+        setMessage(`⏳ Importing... ${job.rows_read || 0} rows processed`);
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const poll = await fetch(`http://127.0.0.1:8000/import_jobs/${data.job_id}?user_id=${user_id}`);
+        job = await poll.json();
+      }
+
+      if (job.status === "done") {
+        setMessage(`✅ ${job.inserted} transactions imported successfully (${job.skipped} skipped).`);
+      } else {
+        setMessage(`❌ Import failed: ${job.error || "unknown error"}`);
+      }
     } catch (err) {
       console.error(err);
       setMessage("❌ Upload failed.");
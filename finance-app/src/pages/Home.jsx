@@ -26,15 +26,12 @@ function Home() {
     };
 
     useEffect(() => {
-        axios.all([
-            axios.get('http://127.0.0.1:8000/analytics/all',{params:{user_id}}),
-            axios.get('http://127.0.0.1:8000/analytics/trends',{params:{user_id}})
-        ])
-        .then(([allRes, trendRes]) => {
-            const expenseData = allRes.data.date.filter(d => d.type_ === 'Expense');
+        axios.get('http://127.0.0.1:8000/analytics/dashboard',{params:{user_id}})
+        .then(res => {
+            const expenseData = res.data.all.date.filter(d => d.type_ === 'Expense');
             setDateAnalysis(expenseData);
             setTrends(getTrendInsights(expenseData));
-            setPeriodicTrends(trendRes.data);
+            setPeriodicTrends(res.data.trends);
         })
         .catch(err => console.error("Failed to fetch analytics", err));
     }, []);